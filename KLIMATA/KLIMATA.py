@@ -1,12 +1,13 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import geopandas as gpd
 import folium
-from streamlit_folium import st_folium
-import json
-import os
+import streamlit.components.v1 as components
+from cvi import CVI_WEIGHTS, cvi_components, score_components
+from data_store import geometry_version, layer_properties, layer_version, tier_for_zoom
+from kpis import KPIS, compute_kpis, format_kpi, kpi_text
+from map_layers import MAP_ENCODING, barangay_layer, map_html, restyle_layer, style_table
+from timeseries import climate_series, current_conditions
 
 # Set page config to wide layout (ONLY ONCE - MUST BE FIRST)
 st.set_page_config(layout="wide")
@@ -81,23 +82,48 @@ layer_option = st.sidebar.radio(
     ]
 )
 
-# --- Load GeoJSON files ---
-# Get the directory where this script is located
-script_dir = os.path.dirname(os.path.abspath(__file__))
-
-# Load GeoJSON files with proper error handling
+# --- Sidebar: what-if CVI weights ---
+# Reweighting only recomputes the weighted sum and the risk clusters from
+# the cached component matrix (see cvi.py); files and map are reused.
+cvi_weight_labels = {
+    "ndvi_risk": "NDVI Risk",
+    "infra_risk": "Amenity Risk",
+    "rwi_risk": "Relative Wealth Index Risk",
+    "coast_risk": "Coast Distance Risk",
+    "pop_risk": "Population Risk",
+    "climate_exposure_score": "Climate Exposure",
+}
+cvi_weights = dict(CVI_WEIGHTS)
+if layer_option == "Climate Vulnerability":
+    with st.sidebar.expander("What-if: CVI weights"):
+        cvi_weights = {
+            name: st.slider(label, 0.0, 1.0, CVI_WEIGHTS[name], 0.05, key=f"cvi_weight_{name}")
+            for name, label in cvi_weight_labels.items()
+        }
+        st.caption("Weights are rescaled to sum to 1.")
+
+weight_total = sum(cvi_weights.values())
+if weight_total > 0:
+    cvi_weights = {name: weight / weight_total for name, weight in cvi_weights.items()}
+else:
+    st.sidebar.warning("Set at least one weight above 0.")
+    cvi_weights = dict(CVI_WEIGHTS)
+what_if = any(abs(cvi_weights[name] - CVI_WEIGHTS[name]) > 1e-9 for name in CVI_WEIGHTS)
+
+# --- Initial map view ---
+map_center = [10.72, 122.5571]
+map_zoom = 13.46
+
+# Polygons are pre-simplified to the detail visible at the initial zoom
+map_tier = tier_for_zoom(map_zoom, map_center[0])
+
+# --- Load layer attributes ---
+# Layers are loaded once per process and shared across sessions (see data_store.py)
 try:
-    with open(os.path.join(script_dir, "climate_risk.geojson"), "r") as f:
-        urban = json.load(f)
-    
-    with open(os.path.join(script_dir, "iloilo_pop.geojson"), "r") as f:
-        barangays = json.load(f)
-    
-    with open(os.path.join(script_dir, "iloilo_infra3.0.geojson"), "r") as f:
-        amenities = json.load(f)
-    
-    with open(os.path.join(script_dir, "iloilo_cli3.0.geojson"), "r") as f:
-        climate = json.load(f)
+    urban = layer_properties("urban")
+    barangays = layer_properties("pop")
+    amenities = layer_properties("infra")
+    climate = layer_properties("climate")
 except FileNotFoundError as e:
     st.error(f"Error loading data files: {e}")
     st.info("Please ensure all GeoJSON files are in the KLIMATA directory")
@@ -108,27 +134,24 @@ except FileNotFoundError as e:
 # ======================================================
 
 # Population quantiles
-pop_values = [f['properties']['pop_count_total'] for f in barangays['features']]
+pop_values = barangays['pop_count_total']
 pop_quantiles = np.quantile(pop_values, [0, 0.33, 0.66, 1.0])
 
 # Amenity index quantiles
-infra_values = [f['properties'].get('infra_index', 0) for f in amenities['features']]
+infra_values = amenities['infra_index'].fillna(0)
 infra_quantiles = np.quantile(infra_values, [0, 0.33, 0.66, 1.0])
 
 # Climate Exposure quantiles
-clim_values = [f['properties'].get('climate_exposure_score', 0) for f in climate['features']]
+clim_values = climate['climate_exposure_score'].fillna(0)
 clim_quantiles = np.quantile(clim_values, [0, 0.33, 0.66, 1.0])
 
 # ======================================================
 # COLOR FUNCTIONS
 # ======================================================
-def color_by_quantile(value, quantiles, colors):
-    if value <= quantiles[1]:
-        return colors[0]
-    elif value <= quantiles[2]:
-        return colors[1]
-    else:
-        return colors[2]
+def color_by_quantile(values, quantiles, colors):
+    """Color a whole column at once: colors[0] up to the 33% quantile,
+    colors[1] up to the 66% quantile, colors[2] above."""
+    return np.asarray(colors)[np.digitize(values, quantiles[1:3], right=True)]
 
 pop_colors = ['#c6dbef', '#6baed6', '#08306b']
 infra_colors = ['#ff9999', '#ff4d4d', '#990000']
@@ -140,10 +163,26 @@ risk_colors = {
     "High Risk": "#cc0000"     # Red
 }
 
-# ======================================================
-# BASE MAP
-# ======================================================
-m = folium.Map(location=[10.72, 122.5571], zoom_start=13.46)
+# Outline/opacity shared by every layer
+layer_style = {"color": "black", "weight": 1, "fillOpacity": 0.6}
+
+# Fill color per barangay, computed once per layer
+urban_fill = urban['risk_label'].fillna("Medium Risk").map(risk_colors).fillna("gray")
+pop_fill = color_by_quantile(pop_values, pop_quantiles, pop_colors)
+infra_fill = color_by_quantile(infra_values, infra_quantiles, infra_colors)
+clim_fill = color_by_quantile(clim_values, clim_quantiles, climate_colors)
+
+# What-if CVI: new index, risk labels and colors for the chosen weights
+if what_if:
+    what_if_scores = score_components(*cvi_components(), cvi_weights)
+    what_if_fill = what_if_scores['risk_label'].map(risk_colors).fillna("gray")
+    risk_counts = compute_kpis(
+        {"urban": what_if_scores},
+        {name: KPIS[name] for name in ("low_risk", "medium_risk", "high_risk")},
+    )
+    risk_text = {name: format_kpi(name, value) for name, value in risk_counts.items()}
+else:
+    risk_text = {name: kpi_text(name) for name in ("low_risk", "medium_risk", "high_risk")}
 
 # ======================================================
 # --- 1. URBAN RISK LAYER (FIRST) ---
@@ -173,18 +212,18 @@ if layer_option == "Climate Vulnerability":
 </div>
 """
 
-    # Example boxes
+    # KPI boxes (values computed from the layers, see kpis.py)
     with col1:
-        st.markdown(kpi_box_style.format(title="Barangays", value="180"), unsafe_allow_html=True)
+        st.markdown(kpi_box_style.format(title="Barangays", value=kpi_text("barangays")), unsafe_allow_html=True)
 
     with col2:
-        st.markdown(kpi_box_style.format(title="Low Risk", value="83"), unsafe_allow_html=True)
+        st.markdown(kpi_box_style.format(title="Low Risk", value=risk_text["low_risk"]), unsafe_allow_html=True)
 
     with col3:
-        st.markdown(kpi_box_style.format(title="Mid-Risk", value="82"), unsafe_allow_html=True)
+        st.markdown(kpi_box_style.format(title="Mid-Risk", value=risk_text["medium_risk"]), unsafe_allow_html=True)
 
     with col4:
-        st.markdown(kpi_box_style.format(title="High Risk", value="15"), unsafe_allow_html=True)
+        st.markdown(kpi_box_style.format(title="High Risk", value=risk_text["high_risk"]), unsafe_allow_html=True)
 
     st.markdown("<div style='height:20px'></div>", unsafe_allow_html=True)
 
@@ -202,42 +241,26 @@ if layer_option == "Climate Vulnerability":
         """,
         unsafe_allow_html=True
     )
-    
-    folium.GeoJson(
-        urban,
-        name="Climate Vulnerability Layer",
-        style_function=lambda f: {
-            "fillColor": risk_colors.get(f['properties'].get('risk_label', "Medium Risk"), "gray"),
-            "color": "black",
-            "weight": 1,
-            "fillOpacity": 0.6,
-        },
-        tooltip=folium.GeoJsonTooltip(
-            fields=[
-                "location_adm4_en",
-                "urban_risk_index",
-                "risk_label",
-                "climate_exposure_score",
-                "infra_risk",
-                "rwi_risk",
-                "ndvi_risk",
-                "coast_risk",
-                "pop_risk"
-            ],
-            aliases=[
-                "Barangay:",
-                "Climate Vulnerability Index:",
-                "Risk Category:",
-                "Climate Exposure Score:",
-                "Amenity Risk (Relative):",
-                "Relative Wealth Index Risk:",
-                "NDVI Risk:",
-                "Coast Distance Risk:",
-                "Population Risk:"
-            ],
-            localize=True
-        )
-    ).add_to(m)
+
+    # --- What-if: how the ranking moves against the published CVI ---
+    if what_if:
+        published = urban.set_index("adm4_pcode")
+        scored = what_if_scores.set_index("adm4_pcode").reindex(published.index)
+        ranking = pd.DataFrame({
+            "Barangay": published["location_adm4_en"],
+            "Rank": published["urban_risk_index"].rank(ascending=False, method="min").astype(int),
+            "What-if Rank": scored["urban_risk_index"].rank(ascending=False, method="min").astype(int),
+            "Risk Label": published["risk_label"],
+            "What-if Risk Label": scored["risk_label"],
+            "What-if CVI": scored["urban_risk_index"].round(3),
+        })
+        moved = ranking[ranking["Rank"] != ranking["What-if Rank"]]
+        moved = moved.iloc[(moved["Rank"] - moved["What-if Rank"]).abs().argsort()[::-1]]
+        relabelled = (ranking["Risk Label"] != ranking["What-if Risk Label"]).sum()
+
+        st.markdown("<div style='height:10px'></div>", unsafe_allow_html=True)
+        with st.expander(f"What-if: {relabelled} barangays change risk label, {len(moved)} change rank"):
+            st.dataframe(moved, hide_index=True, width="stretch")
 
 # ======================================================
 # 2. POPULATION LAYER
@@ -267,23 +290,23 @@ elif layer_option == "Population Layer":
 </div>
 """
 
-    # Example boxes
+    # KPI boxes (values computed from the layers, see kpis.py)
     with col1:
-        st.markdown(kpi_box_style.format(title="Population", value="473,728"), unsafe_allow_html=True)
+        st.markdown(kpi_box_style.format(title="Population", value=kpi_text("population")), unsafe_allow_html=True)
 
     with col2:
-        st.markdown(kpi_box_style.format(title="Average per Barangay", value="2315.16"), unsafe_allow_html=True)
+        st.markdown(kpi_box_style.format(title="Average per Barangay", value=kpi_text("population_mean")), unsafe_allow_html=True)
 
     with col3:
-        st.markdown(kpi_box_style.format(title="Highest Populated Barangay", value="10157.33"), unsafe_allow_html=True)
+        st.markdown(kpi_box_style.format(title="Highest Populated Barangay", value=kpi_text("population_max")), unsafe_allow_html=True)
 
     with col4:
-        st.markdown(kpi_box_style.format(title="Lowest Populated Barangay", value="153.71"), unsafe_allow_html=True)
+        st.markdown(kpi_box_style.format(title="Lowest Populated Barangay", value=kpi_text("population_min")), unsafe_allow_html=True)
 
     st.markdown("<div style='height:20px'></div>", unsafe_allow_html=True)
 
     st.markdown(
-        """
+        f"""
         <div style="
             border:1px solid #ccc; 
             padding:10px; 
@@ -291,27 +314,11 @@ elif layer_option == "Population Layer":
             background-color:#f9f9f9; 
             font-size:16px;
         ">
-            The map shows that Iloilo City's 473,000 residents are largely concentrated in <b>coastal barangays</b>, particularly in Molo and City Proper, where densities reach over 9,000 people per barangay.
+            The map shows that Iloilo City's {kpi_text('population')} residents are largely concentrated in <b>coastal barangays</b>, particularly in Molo and City Proper, where densities reach over 9,000 people per barangay.
         </div>
         """,
         unsafe_allow_html=True
     )
-    
-    folium.GeoJson(
-        barangays,
-        name="Population",
-        style_function=lambda f: {
-            'fillColor': color_by_quantile(f['properties']['pop_count_total'], pop_quantiles, pop_colors),
-            'color': 'black',
-            'weight': 1,
-            'fillOpacity': 0.6
-        },
-        tooltip=folium.GeoJsonTooltip(
-            fields=['location_adm4_en', 'pop_count_total', 'brgy_total_area_y'],
-            aliases=['Barangay:', 'Population:', 'Area (sq km):'],
-            localize=True
-        )
-    ).add_to(m)
 
 # ======================================================
 # 3. AMENITY RISK LAYER
@@ -341,18 +348,18 @@ elif layer_option == "Amenity Risk Layer":
 </div>
 """
 
-    # Example boxes
+    # KPI boxes (values computed from the layers, see kpis.py)
     with col1:
-        st.markdown(kpi_box_style.format(title="Avg. Distance to Shelter (m)", value="967.28m"), unsafe_allow_html=True)
+        st.markdown(kpi_box_style.format(title="Avg. Distance to Shelter (m)", value=kpi_text("shelter_distance")), unsafe_allow_html=True)
 
     with col2:
-        st.markdown(kpi_box_style.format(title="Avg. Distance to Community Center (m)", value="805.45m"), unsafe_allow_html=True)
+        st.markdown(kpi_box_style.format(title="Avg. Distance to Community Center (m)", value=kpi_text("community_centre_distance")), unsafe_allow_html=True)
 
     with col3:
-        st.markdown(kpi_box_style.format(title="Population % near Health Center (5min)", value="88.17%"), unsafe_allow_html=True)
+        st.markdown(kpi_box_style.format(title="Population % near Health Center (5min)", value=kpi_text("health_center_5min")), unsafe_allow_html=True)
 
     with col4:
-        st.markdown(kpi_box_style.format(title="Population % near Hospital (5min)", value="48.72%"), unsafe_allow_html=True)
+        st.markdown(kpi_box_style.format(title="Population % near Hospital (5min)", value=kpi_text("hospital_5min")), unsafe_allow_html=True)
 
     st.markdown("<div style='height:20px'></div>", unsafe_allow_html=True)
     
@@ -373,41 +380,23 @@ elif layer_option == "Amenity Risk Layer":
         unsafe_allow_html=True
     )
 
-    folium.GeoJson(
-        amenities,
-        name="Amenity Risk",
-        style_function=lambda f: {
-            'fillColor': color_by_quantile(f['properties'].get('infra_index', 0), infra_quantiles, infra_colors),
-            'color': 'black',
-            'weight': 1,
-            'fillOpacity': 0.6
-        },
-        tooltip=folium.GeoJsonTooltip(
-            fields=[
-                'location_adm4_en', 'infra_index', 'college_nearest', 'community_centre_nearest',
-                'school_nearest', 'shelter_nearest', 'town_hall_nearest', 'university_nearest',
-                'brgy_healthcenter_pop_reached_pct_5min', 'brgy_healthcenter_pop_reached_pct_15min',
-                'brgy_healthcenter_pop_reached_pct_30min', 'hospital_pop_reached_pct_5min',
-                'hospital_pop_reached_pct_15min', 'hospital_pop_reached_pct_30min',
-                'rhu_pop_reached_pct_5min', 'rhu_pop_reached_pct_15min', 'rhu_pop_reached_pct_30min'
-            ],
-            aliases=[
-                'Barangay:', 'Amenity Risk Index:', 'College (m):', 'Community Centre (m):',
-                'School (m):', 'Shelter (m):', 'Town Hall (m):', 'University (m):',
-                '% Pop near Health Center (5 min):', '% Pop near Health Center (15 min):',
-                '% Pop near Health Center (30 min):', '% Pop near Hospital (5 min):',
-                '% Pop near Hospital (15 min):', '% Pop near Hospital (30 min):',
-                '% Pop near RHU (5 min):', '% Pop near RHU (15 min):',
-                '% Pop near RHU (30 min):'
-            ],
-            localize=True
-        )
-    ).add_to(m)
-
 # ======================================================
 # 4. CLIMATE EXPOSURE LAYER
 # ======================================================
 elif layer_option == "Climate Exposure Layer":
+    # Current conditions come from the time-series store (timeseries.py)
+    # once it has data; until then, from the climate layer's snapshot
+    series = climate_series()
+    climate_kpis = {name: kpi for name, kpi in KPIS.items() if kpi.layer == "climate"}
+    if series is not None:
+        current = compute_kpis(
+            {"climate": current_conditions([kpi.column for kpi in climate_kpis.values()])},
+            climate_kpis,
+        )
+        climate_text = {name: format_kpi(name, value) for name, value in current.items()}
+    else:
+        climate_text = {name: kpi_text(name) for name in climate_kpis}
+
     col1, col2, col3, col4 = st.columns(4)
 
     # Common CSS for all boxes with image background
@@ -432,18 +421,30 @@ elif layer_option == "Climate Exposure Layer":
 </div>
 """
 
-    # Example boxes
+    # KPI boxes (values computed from the layers, see kpis.py)
     with col1:
-        st.markdown(kpi_box_style.format(title="Avg. Heat Index", value="30.37°C"), unsafe_allow_html=True)
+        st.markdown(kpi_box_style.format(title="Avg. Heat Index", value=climate_text["heat_index"]), unsafe_allow_html=True)
 
     with col2:
-        st.markdown(kpi_box_style.format(title="Avg. Rainfall Estimate", value="6.45mm"), unsafe_allow_html=True)
+        st.markdown(kpi_box_style.format(title="Avg. Rainfall Estimate", value=climate_text["rainfall"]), unsafe_allow_html=True)
 
     with col3:
-        st.markdown(kpi_box_style.format(title="Avg. PM2.5", value="13.17"), unsafe_allow_html=True)
+        st.markdown(kpi_box_style.format(title="Avg. PM2.5", value=climate_text["pm25"]), unsafe_allow_html=True)
 
     with col4:
-        st.markdown(kpi_box_style.format(title="Avg PM10", value="19.18"), unsafe_allow_html=True)
+        st.markdown(kpi_box_style.format(title="Avg PM10", value=climate_text["pm10"]), unsafe_allow_html=True)
+
+    if series is not None:
+        st.caption(f"Current conditions as of {series.end}")
+        with st.expander("Last 30 days"):
+            st.line_chart(pd.DataFrame({
+                "Heat Index (°C)": series.city_mean("heat_index", 30),
+                "Rainfall (mm)": series.city_mean("pr", 30),
+                "PM2.5": series.city_mean("pm25", 30),
+                "PM10": series.city_mean("pm10", 30),
+            }))
+            anomalous = (series.latest_anomaly("heat_index").abs() > 2).sum()
+            st.markdown(f"Barangays with an unusual heat index today (more than 2 SD from their last 30 days): **{anomalous}**")
 
     st.markdown("<div style='height:20px'></div>", unsafe_allow_html=True)
 
@@ -461,18 +462,91 @@ elif layer_option == "Climate Exposure Layer":
         """,
         unsafe_allow_html=True
     )
-    
-    folium.GeoJson(
-        climate,
-        name="Climate Exposure Layer",
-        style_function=lambda f: {
-            'fillColor': color_by_quantile(f['properties'].get('climate_exposure_score', 0),
-                                           clim_quantiles, climate_colors),
-            'color': 'black',
-            'weight': 1,
-            'fillOpacity': 0.6
-        },
-        tooltip=folium.GeoJsonTooltip(
+
+# ======================================================
+# MAP
+# ======================================================
+# The map for a layer is the same for every user, so it is built and
+# serialized once per layer and data version, then shared by all sessions.
+# The version is that layer's own (plus the geometry), so an update to one
+# layer doesn't rebuild the others' maps.
+# What-if CVI weights only restyle the cached map in the browser.
+@st.cache_resource(show_spinner=False, max_entries=8)
+def render_layer_map(layer_option, version, encoding):
+    m = folium.Map(location=map_center, zoom_start=map_zoom)
+
+    if layer_option == "Climate Vulnerability":
+        layer = barangay_layer(
+            "urban",
+            map_tier,
+            encoding=encoding,
+            name="Climate Vulnerability Layer",
+            styles=style_table(urban, urban_fill, **layer_style),
+            fields=[
+                "location_adm4_en",
+                "urban_risk_index",
+                "risk_label",
+                "climate_exposure_score",
+                "infra_risk",
+                "rwi_risk",
+                "ndvi_risk",
+                "coast_risk",
+                "pop_risk"
+            ],
+            aliases=[
+                "Barangay:",
+                "Climate Vulnerability Index:",
+                "Risk Category:",
+                "Climate Exposure Score:",
+                "Amenity Risk (Relative):",
+                "Relative Wealth Index Risk:",
+                "NDVI Risk:",
+                "Coast Distance Risk:",
+                "Population Risk:"
+            ],
+        )
+    elif layer_option == "Population Layer":
+        layer = barangay_layer(
+            "pop",
+            map_tier,
+            encoding=encoding,
+            name="Population",
+            styles=style_table(barangays, pop_fill, **layer_style),
+            fields=['location_adm4_en', 'pop_count_total', 'brgy_total_area_y'],
+            aliases=['Barangay:', 'Population:', 'Area (sq km):'],
+        )
+    elif layer_option == "Amenity Risk Layer":
+        layer = barangay_layer(
+            "infra",
+            map_tier,
+            encoding=encoding,
+            name="Amenity Risk",
+            styles=style_table(amenities, infra_fill, **layer_style),
+            fields=[
+                'location_adm4_en', 'infra_index', 'college_nearest', 'community_centre_nearest',
+                'school_nearest', 'shelter_nearest', 'town_hall_nearest', 'university_nearest',
+                'brgy_healthcenter_pop_reached_pct_5min', 'brgy_healthcenter_pop_reached_pct_15min',
+                'brgy_healthcenter_pop_reached_pct_30min', 'hospital_pop_reached_pct_5min',
+                'hospital_pop_reached_pct_15min', 'hospital_pop_reached_pct_30min',
+                'rhu_pop_reached_pct_5min', 'rhu_pop_reached_pct_15min', 'rhu_pop_reached_pct_30min'
+            ],
+            aliases=[
+                'Barangay:', 'Amenity Risk Index:', 'College (m):', 'Community Centre (m):',
+                'School (m):', 'Shelter (m):', 'Town Hall (m):', 'University (m):',
+                '% Pop near Health Center (5 min):', '% Pop near Health Center (15 min):',
+                '% Pop near Health Center (30 min):', '% Pop near Hospital (5 min):',
+                '% Pop near Hospital (15 min):', '% Pop near Hospital (30 min):',
+                '% Pop near RHU (5 min):', '% Pop near RHU (15 min):',
+                '% Pop near RHU (30 min):'
+            ],
+        )
+    elif layer_option == "Climate Exposure Layer":
+        layer = barangay_layer(
+            "climate",
+            map_tier,
+            encoding=encoding,
+            name="Climate Exposure Layer",
+            styles=style_table(climate, clim_fill, **layer_style),
             fields=[
                 'location_adm4_en',
                 'climate_exposure_score',
@@ -499,16 +573,32 @@ elif layer_option == "Climate Exposure Layer":
                 'PM10:',
                 'PM2.5:'
             ],
-            localize=True
         )
-    ).add_to(m)
 
-# ======================================================
-# LAYER CONTROL
-# ======================================================
-folium.LayerControl().add_to(m)
+    layer.add_to(m)
+    folium.LayerControl().add_to(m)
+    return map_html(m, layer_option), layer.get_name()
 
 # ======================================================
 # DISPLAY MAP
 # ======================================================
-st_folium(m, width=2000, height=1000)
+# Vector tiles can't be restyled client-side, so what-if mode uses TopoJSON
+map_encoding = "topojson" if what_if and MAP_ENCODING == "mvt" else MAP_ENCODING
+map_layer_keys = {
+    "Climate Vulnerability": "urban",
+    "Population Layer": "pop",
+    "Amenity Risk Layer": "infra",
+    "Climate Exposure Layer": "climate",
+}
+map_version = (layer_version(map_layer_keys[layer_option]), geometry_version())
+map_page, map_layer_name = render_layer_map(layer_option, map_version, map_encoding)
+
+if what_if:
+    map_page = restyle_layer(
+        map_page,
+        map_layer_name,
+        style_table(what_if_scores, what_if_fill, **layer_style),
+        what_if_scores.set_index("adm4_pcode")[["urban_risk_index", "risk_label"]],
+    )
+
+components.html(map_page, height=1000)
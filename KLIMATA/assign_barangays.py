@@ -0,0 +1,111 @@
+"""Tag incident points (flood, heat, ...) with their barangay and its CVI.
+
+Run from the repo root:
+
+    python KLIMATA/assign_barangays.py incidents.csv incidents_tagged.csv
+
+The input CSV is streamed in chunks (--chunksize rows). Each chunk is
+spatially joined against the barangay polygons in a worker process (one per
+core by default, see spatial_index.py for the lookup), and the enriched rows
+are appended to the output in input order. Every input column is kept; the
+columns in ASSIGNED_COLUMNS are added, empty for points outside the city.
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from build_data import BBOX_COLUMNS, KEY, SEP
+from data_store import load_table
+from spatial_index import BarangaySpatialIndex
+
+# Output column -> urban layer (climate_risk.geojson) property
+ASSIGNED_COLUMNS = {
+    KEY: KEY,
+    "barangay": "location_adm4_en",
+    "urban_risk_index": "urban_risk_index",
+    "risk_label": "risk_label",
+}
+
+DEFAULT_CHUNKSIZE = 100_000
+
+# Set in each worker by _init_worker
+_index = None
+_attributes = None
+
+
+def barangay_attributes(table):
+    """The ASSIGNED_COLUMNS of every barangay, indexed by adm4_pcode."""
+    columns = {f"urban{SEP}{prop}": name for name, prop in ASSIGNED_COLUMNS.items() if name != KEY}
+    return table[[KEY] + list(columns)].rename(columns=columns).set_index(KEY)
+
+
+def _init_worker(pcodes, geometries, boxes, attributes):
+    global _index, _attributes
+    _index = BarangaySpatialIndex(pcodes, geometries, boxes)
+    _attributes = attributes
+
+
+def assign_chunk(chunk, lon_column, lat_column):
+    """Add the barangay columns to one chunk of points (runs in a worker)."""
+    lons = pd.to_numeric(chunk[lon_column], errors="coerce").to_numpy(dtype=float)
+    lats = pd.to_numeric(chunk[lat_column], errors="coerce").to_numpy(dtype=float)
+    pcodes = _index.locate_many(lons, lats)
+
+    assigned = _attributes.reindex(pcodes)
+    assigned.index = chunk.index
+    assigned.insert(0, KEY, pcodes)
+    return pd.concat([chunk, assigned], axis=1)
+
+
+def assign_csv(source, target, lon_column="longitude", lat_column="latitude",
+               chunksize=DEFAULT_CHUNKSIZE, workers=None):
+    """Stream `source` through the spatial join into `target`; returns the row count.
+
+    At most two chunks per worker are in flight, so memory stays bounded
+    however large the input is.
+    """
+    table = load_table()
+    init_args = (
+        table[KEY].to_numpy(),
+        table.geometry.values,
+        table[BBOX_COLUMNS].to_numpy(),
+        barangay_attributes(table),
+    )
+    workers = workers or os.cpu_count() or 1
+
+    rows = 0
+    header = True
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=init_args) as pool:
+        pending = []
+        chunks = pd.read_csv(source, chunksize=chunksize)
+        for chunk in chunks:
+            pending.append(pool.submit(assign_chunk, chunk, lon_column, lat_column))
+            if len(pending) < 2 * workers:
+                continue
+            rows += _write(pending.pop(0).result(), target, header)
+            header = False
+        for future in pending:
+            rows += _write(future.result(), target, header)
+            header = False
+    return rows
+
+
+def _write(chunk, target, header):
+    chunk.to_csv(target, mode="w" if header else "a", header=header, index=False)
+    return len(chunk)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="input CSV with one point per row")
+    parser.add_argument("target", help="output CSV (overwritten)")
+    parser.add_argument("--lon", default="longitude", help="longitude column (default: longitude)")
+    parser.add_argument("--lat", default="latitude", help="latitude column (default: latitude)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    rows = assign_csv(args.source, args.target, args.lon, args.lat, args.chunksize, args.workers)
+    print(f"Wrote {rows} rows to {args.target}")
@@ -0,0 +1,138 @@
+"""Barangay names in free text (forum posts) -> adm4_pcodes.
+
+All barangay names are compiled into one regular expression shaped like a
+trie of the names, so a post is scanned once for every barangay at the same
+time, and a longer name wins over a shorter one it starts with ("Rizal
+Palapala II" over "Rizal Palapala I").
+
+Names are matched case- and accent-insensitively, with any run of spaces,
+hyphens, dots, commas or parentheses (or none) between words: "bito on", "Bitoon" and
+"Bito-on" all match. A name with a parenthesized part matches with or
+without the parentheses ("Luna (Jaro)", "Luna, Jaro"), and also by the part
+before them when no other barangay shares it ("Seminario" for "Seminario
+(Burgos Jalandoni)", but not "Luna").
+
+A one-word name (or part before the parentheses) that is also an everyday
+word or a given name, listed in COMMON_WORD_NAMES, only counts after
+"Brgy."/"Bgy."/"Barangay": "Brgy. Inday" is tagged, "Salamat Inday" and
+"Airport road" are not.
+"""
+import re
+import unicodedata
+from collections import Counter
+
+import streamlit as st
+
+from build_data import KEY
+from data_store import layer_properties, layer_version
+
+# Between two words of a name
+_SEPARATOR = r"[\s\-.,()]*"
+_END = ""
+
+# One-word barangay names that are also common nouns, given names or names
+# of people that streets and places everywhere are named after
+COMMON_WORD_NAMES = {
+    "aguinaldo", "airport", "bakhaw", "bonifacio", "camalig", "danao", "democracia",
+    "flores", "gloria", "inday", "kahirupan", "kasingkasing", "katilingban",
+    "kauswagan", "liberation", "macarthur", "magsaysay", "nonoy", "osmena",
+    "quezon", "railway", "rizal", "sambag", "sampaguita", "taal",
+}
+
+# "Brgy." and friends right before a match (searched up to its start)
+_BARANGAY_PREFIX = re.compile(r"(?<!\w)(?:brgy|bgy|barangay)" + _SEPARATOR + "$")
+
+
+def normalize(text):
+    """Lowercase `text` without accents ("Oñate" -> "onate")."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def _words(name):
+    return re.findall(r"\w+", normalize(name))
+
+
+def _joined(words):
+    # Lookup key of a name or match, ignoring the separators between words
+    return "".join(words)
+
+
+def name_aliases(names):
+    """{alias words (tuple): pcodes} for {pcode: barangay name}."""
+    base = {pcode: re.sub(r"\s*\(.*?\)", "", name).strip() for pcode, name in names.items()}
+    base_counts = Counter(tuple(_words(b)) for b in base.values())
+
+    aliases = {}
+    for pcode, name in names.items():
+        forms = [_words(name)]
+        if base_counts[tuple(_words(base[pcode]))] == 1:
+            forms.append(_words(base[pcode]))
+        for words in forms:
+            if words:
+                aliases.setdefault(tuple(words), set()).add(pcode)
+    return aliases
+
+
+def _trie_pattern(node):
+    # node: {character or " " (word break): child node}, _END marks a name end
+    branches = []
+    optional = _END in node
+    for atom in sorted(a for a in node if a != _END):
+        piece = _SEPARATOR if atom == " " else re.escape(atom)
+        rest = _trie_pattern(node[atom])
+        branches.append(piece + rest)
+    if not branches:
+        return ""
+    pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    if optional:
+        pattern = "(?:" + pattern + ")?"
+    return pattern
+
+
+class BarangayMatcher:
+    """Finds barangays mentioned in a text; see the module docstring."""
+
+    def __init__(self, names):
+        self.names = dict(names)
+        self.aliases = name_aliases(self.names)
+        # The pattern also matches names run together ("Bitoon"), so a match
+        # is looked up without its separators
+        self._pcodes = {}
+        for words, pcodes in self.aliases.items():
+            self._pcodes.setdefault(_joined(words), set()).update(pcodes)
+        self._needs_prefix = {words[0] for words in self.aliases if len(words) == 1} & COMMON_WORD_NAMES
+
+        trie = {}
+        for words in self.aliases:
+            node = trie
+            for atom in " ".join(words):
+                node = node.setdefault(atom, {})
+            node[_END] = {}
+        self.pattern = re.compile(r"(?<!\w)" + _trie_pattern(trie) + r"(?!\w)") if trie else None
+
+    def match(self, text):
+        """pcodes of the barangays named in `text`, in order of appearance."""
+        if self.pattern is None or not text:
+            return []
+        found = []
+        text = normalize(text)
+        for match in self.pattern.finditer(text):
+            key = _joined(_words(match.group()))
+            if key in self._needs_prefix and not _BARANGAY_PREFIX.search(text, max(match.start() - 16, 0), match.start()):
+                continue
+            for pcode in sorted(self._pcodes.get(key, ())):
+                if pcode not in found:
+                    found.append(pcode)
+        return found
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _barangay_matcher(version):
+    props = layer_properties("urban")
+    return BarangayMatcher(zip(props[KEY], props["location_adm4_en"]))
+
+
+def barangay_matcher():
+    """Matcher over the urban layer's barangay names, once per data version."""
+    return _barangay_matcher(layer_version("urban"))
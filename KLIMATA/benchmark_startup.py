@@ -0,0 +1,64 @@
+"""Cold-start time of every page.
+
+Run from the repo root:
+
+    python KLIMATA/benchmark_startup.py [--repeat N]
+
+Each page is run once in a fresh Python process (streamlit itself is already
+imported, as it is in a running server), so the time includes importing the
+page's dependencies and filling its caches. Build the data first
+(build_data.py) or the first page also pays for the table build. The
+"heavy" column lists which of HEAVY_MODULES the page pulled in.
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+
+from build_data import DATA_DIR
+
+HEAVY_MODULES = ["geopandas", "pyproj", "matplotlib", "folium", "streamlit_folium", "rtree"]
+
+# Runs inside the fresh process; prints one JSON line
+PROBE = """
+import json, sys, time
+sys.path.insert(0, {data_dir!r})
+from streamlit.testing.v1 import AppTest
+app = AppTest.from_file({page!r}, default_timeout=300)
+start = time.perf_counter()
+app.run()
+print(json.dumps({{
+    "seconds": time.perf_counter() - start,
+    "errors": [str(e.value) for e in app.exception],
+    "heavy": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def page_files():
+    return [os.path.join(DATA_DIR, "KLIMATA.py")] + sorted(glob.glob(os.path.join(DATA_DIR, "pages", "*.py")))
+
+
+def cold_start(page):
+    probe = PROBE.format(data_dir=DATA_DIR, page=page, heavy=HEAVY_MODULES)
+    out = subprocess.run(
+        [sys.executable, "-c", probe], cwd=DATA_DIR, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=1, help="runs per page; the fastest is reported")
+    args = parser.parse_args()
+
+    print(f"{'page':<36}{'seconds':>9}  heavy")
+    for page in page_files():
+        runs = [cold_start(page) for _ in range(args.repeat)]
+        best = min(runs, key=lambda r: r["seconds"])
+        status = ", ".join(best["heavy"]) or "-"
+        if best["errors"]:
+            status += "  ERROR: " + "; ".join(best["errors"])
+        print(f"{os.path.basename(page):<36}{best['seconds']:>9.2f}  {status}")
@@ -0,0 +1,174 @@
+"""Build step for the merged barangay table.
+
+Run from the repo root:
+
+    python KLIMATA/build_data.py
+
+The four layer GeoJSON files carry the same barangay polygons with different
+properties. This writes ONE GeoParquet file holding a single geometry column
+(plus pre-simplified copies of it, see GEOMETRY_TIERS) and every layer's
+properties, keyed by adm4_pcode. Property columns are
+namespaced as "<layer>__<property>" (e.g. "urban__risk_label") because the
+layers reuse names such as "ndvi" with different meanings.
+"""
+import glob
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import shapely
+from shapely.geometry import shape
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+BUILD_DIR = os.path.join(DATA_DIR, "build")
+
+# Layer key -> source file. The first layer fixes the row order.
+LAYER_FILES = {
+    "urban": "climate_risk.geojson",        # Climate Vulnerability
+    "pop": "iloilo_pop.geojson",            # Population
+    "infra": "iloilo_infra3.0.geojson",     # Amenity Risk
+    "climate": "iloilo_cli3.0.geojson",     # Climate Exposure
+}
+
+KEY = "adm4_pcode"
+SEP = "__"
+
+# Bump when the layout of the built table changes so old files are rebuilt
+BUILD_VERSION = "3"
+
+# Per-barangay bounding box of the full geometry, over all parts and rings
+BBOX_COLUMNS = [f"bbox{SEP}{side}" for side in ("minx", "miny", "maxx", "maxy")]
+
+# Simplified geometry tiers -> tolerance in degrees (1e-5 deg ~ 1.1 m).
+# "full" is the untouched `geometry` column.
+GEOMETRY_TIERS = {
+    "fine": 0.00003,      # ~3 m
+    "medium": 0.0001,     # ~11 m
+    "coarse": 0.0003,     # ~33 m
+}
+
+
+def source_paths():
+    return [os.path.join(DATA_DIR, fn) for fn in LAYER_FILES.values()]
+
+
+def source_hash():
+    """Content hash of all source layers; names the built artifacts."""
+    h = hashlib.sha1(BUILD_VERSION.encode())
+    for path in source_paths():
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:12]
+
+
+def table_path(digest):
+    return os.path.join(BUILD_DIR, f"barangays-{digest}.parquet")
+
+
+# Tables updated by ingest.py are revisions of a source build:
+# "<source hash>.<n>", listed in that build's manifest
+def revision_digest(source, revision):
+    return f"{source}.{revision}"
+
+
+def base_digest(digest):
+    return digest.split(".")[0]
+
+
+def manifest_path(source):
+    return os.path.join(BUILD_DIR, f"manifest-{source}.json")
+
+
+def tier_column(tier):
+    return "geometry" if tier == "full" else f"geometry{SEP}{tier}"
+
+
+def simplify_tiers(geometry):
+    """Simplify the polygons as one coverage so neighbours keep sharing edges.
+
+    Per-polygon simplification would move each side of a shared border
+    differently and open gaps/overlaps between barangays.
+    """
+    import geopandas as gpd
+
+    return {
+        tier_column(tier): gpd.GeoSeries(
+            shapely.coverage_simplify(geometry.values, tolerance),
+            index=geometry.index,
+            crs=geometry.crs,
+        )
+        for tier, tolerance in GEOMETRY_TIERS.items()
+    }
+
+
+def bounding_boxes(geometry):
+    """(minx, miny, maxx, maxy) rows for every geometry, in one pass.
+
+    All coordinates of all polygons are pulled into one flat array and
+    reduced per geometry with np.minimum/np.maximum.reduceat. Empty
+    geometries get NaN.
+    """
+    coords, owner = shapely.get_coordinates(np.asarray(geometry), return_index=True)
+    boxes = np.full((len(geometry), 4), np.nan)
+    if len(coords):
+        starts = np.flatnonzero(np.r_[True, owner[1:] != owner[:-1]])
+        boxes[owner[starts], :2] = np.minimum.reduceat(coords, starts)
+        boxes[owner[starts], 2:] = np.maximum.reduceat(coords, starts)
+    return boxes
+
+
+def build_barangay_table():
+    """Join every layer on adm4_pcode into one GeoDataFrame."""
+    # Imported here so that importing this module for its constants (as
+    # data_store does on every page) doesn't load GDAL/pyproj
+    import geopandas as gpd
+
+    frames = []
+    geometry = None
+    for name, fn in LAYER_FILES.items():
+        with open(os.path.join(DATA_DIR, fn), "r") as f:
+            features = json.load(f)["features"]
+
+        props = pd.DataFrame([feat["properties"] for feat in features])
+        props = props.set_index(KEY).add_prefix(name + SEP)
+        frames.append(props)
+
+        geoms = gpd.GeoSeries(
+            [shape(feat["geometry"]) for feat in features],
+            index=props.index,
+        )
+        # Keep the first geometry seen for each barangay
+        geometry = geoms if geometry is None else geometry.combine_first(geoms)
+
+    table = pd.concat(frames, axis=1, join="outer", sort=False)
+    table = gpd.GeoDataFrame(table, geometry=geometry.reindex(table.index), crs="OGC:CRS84")
+    for column, simplified in simplify_tiers(table.geometry).items():
+        table[column] = simplified
+    table[BBOX_COLUMNS] = bounding_boxes(table.geometry.values)
+    table.index.name = KEY
+    return table.reset_index()
+
+
+def write_barangay_table(table, digest):
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    path = table_path(digest)
+    table.to_parquet(path, index=False)
+
+    # Drop tables (and their ingested revisions) built from older versions
+    # of the sources
+    for old in glob.glob(os.path.join(BUILD_DIR, "barangays-*.parquet")):
+        if not os.path.basename(old).startswith(f"barangays-{base_digest(digest)}"):
+            os.remove(old)
+    for old in glob.glob(os.path.join(BUILD_DIR, "manifest-*.json")):
+        if old != manifest_path(base_digest(digest)):
+            os.remove(old)
+    return path
+
+
+if __name__ == "__main__":
+    digest = source_hash()
+    table = build_barangay_table()
+    path = write_barangay_table(table, digest)
+    print(f"Wrote {len(table)} barangays x {table.shape[1]} columns to {path}")
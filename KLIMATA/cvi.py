@@ -0,0 +1,202 @@
+"""Climate Vulnerability Index (CVI) engine.
+
+Recomputes the CVI columns shipped in climate_risk.geojson / RISK_TABLE.csv
+(ndvi_risk ... pop_risk, urban_risk_index, risk_level, risk_label) from the
+raw indicators, as whole-column NumPy operations:
+
+    1. normalize   every indicator to 0..1 (min-max; inverted where a
+                   larger value means less risk, e.g. distance to coast)
+    2. weight      urban_risk_index = components @ CVI_WEIGHTS
+    3. cluster     1-D k-means (k=3) on urban_risk_index
+    4. label       clusters ranked by centre -> Low / Medium / High Risk
+
+Check the engine against the shipped values, or write a fresh risk table:
+
+    python KLIMATA/cvi.py [output.csv]
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from build_data import KEY, LAYER_FILES
+from data_store import RISK_TABLE_COLUMNS, layer_properties, table_version
+
+# ======================================================
+# CVI DEFINITION
+# ======================================================
+# Component -> (layer, raw column, direction). direction -1 means a larger
+# raw value is *less* risky, so the normalized value is flipped.
+CVI_INDICATORS = {
+    "ndvi_risk": ("climate", "ndvi", 1),
+    "infra_risk": ("infra", "infra_index", 1),
+    "rwi_risk": ("urban", "rwi_mean", 1),
+    "coast_risk": ("urban", "brgy_distance_to_coast", -1),
+    "pop_risk": ("pop", "pop_count_total", 1),
+}
+
+# Already a 0..1 score in iloilo_cli3.0, so it is used as-is
+CLIMATE_EXPOSURE = ("climate", "climate_exposure_score")
+
+CVI_COMPONENTS = list(CVI_INDICATORS) + [CLIMATE_EXPOSURE[1]]
+
+CVI_WEIGHTS = {
+    "ndvi_risk": 0.10,
+    "infra_risk": 0.20,
+    "rwi_risk": 0.15,
+    "coast_risk": 0.05,
+    "pop_risk": 0.20,
+    "climate_exposure_score": 0.30,
+}
+
+# Cluster rank (lowest centre first) -> label
+RISK_LABELS = ["Low Risk", "Medium Risk", "High Risk"]
+
+
+# ======================================================
+# ENGINE
+# ======================================================
+def minmax(matrix):
+    """Scale every column to 0..1; constant columns become 0, NaN stays NaN."""
+    matrix = np.asarray(matrix, dtype=float)
+    low = np.nanmin(matrix, axis=0)
+    span = np.nanmax(matrix, axis=0) - low
+    scaled = np.divide(matrix - low, span, out=np.zeros_like(matrix), where=span > 0)
+    scaled[np.isnan(matrix)] = np.nan
+    return scaled
+
+
+def component_matrix(layers):
+    """(pcodes, n x len(CVI_COMPONENTS) array) of normalized CVI components.
+
+    `layers` maps layer name -> attribute DataFrame (as from
+    layer_properties); rows follow the urban layer.
+    """
+    pcodes = layers["urban"][KEY].to_numpy()
+
+    def column(layer, name):
+        values = layers[layer].set_index(KEY)[name]
+        return values.reindex(pcodes).to_numpy(dtype=float)
+
+    raw = np.column_stack([column(layer, name) for layer, name, _ in CVI_INDICATORS.values()])
+    directions = np.array([direction for _, _, direction in CVI_INDICATORS.values()])
+    normalized = minmax(raw * directions)
+    return pcodes, np.column_stack([normalized, column(*CLIMATE_EXPOSURE)])
+
+
+def weight_vector(weights=None):
+    weights = CVI_WEIGHTS if weights is None else weights
+    return np.array([weights.get(name, 0.0) for name in CVI_COMPONENTS], dtype=float)
+
+
+def kmeans_1d(values, k=3, n_init=10, max_iter=100, seed=0):
+    """1-D k-means; returns cluster ranks (0 = lowest centre), -1 for NaN.
+
+    In one dimension every cluster is a run of the sorted values, so each
+    Lloyd step is a searchsorted for the boundaries plus prefix sums for the
+    means: O(k log n) per iteration after one sort. The best of `n_init`
+    k-means++ seeded starts (lowest inertia) is kept.
+    """
+    values = np.asarray(values, dtype=float)
+    labels = np.full(len(values), -1)
+    finite = np.flatnonzero(np.isfinite(values))
+    order = finite[np.argsort(values[finite], kind="stable")]
+    x = values[order]
+    n = len(x)
+    if n == 0:
+        return labels
+    k = min(k, len(np.unique(x)))
+
+    sums = np.r_[0.0, np.cumsum(x)]
+    squares = np.r_[0.0, np.cumsum(x * x)]
+    rng = np.random.default_rng(seed)
+
+    best = None
+    for _ in range(n_init):
+        centres = _kmeans_plus_plus(x, k, rng)
+        for _ in range(max_iter):
+            cuts = np.r_[0, np.searchsorted(x, (centres[1:] + centres[:-1]) / 2), n]
+            counts = np.diff(cuts)
+            totals = np.diff(sums[cuts])
+            new = np.where(counts > 0, totals / np.maximum(counts, 1), centres)
+            if np.array_equal(new, centres):
+                break
+            centres = new
+        inertia = (np.diff(squares[cuts]) - totals ** 2 / np.maximum(counts, 1)).sum()
+        if best is None or inertia < best[0]:
+            best = (inertia, cuts)
+
+    labels[order] = np.repeat(np.arange(k), np.diff(best[1]))
+    return labels
+
+
+def _kmeans_plus_plus(x, k, rng):
+    # Each further centre is drawn with probability ~ squared distance to
+    # the nearest centre chosen so far
+    centres = [rng.choice(x)]
+    distance = (x - centres[0]) ** 2
+    for _ in range(k - 1):
+        centres.append(rng.choice(x, p=distance / distance.sum()))
+        distance = np.minimum(distance, (x - centres[-1]) ** 2)
+    return np.sort(centres)
+
+
+def score_components(pcodes, components, weights=None):
+    """CVI table (components, index, cluster rank and label) for one weighting."""
+    index = components @ weight_vector(weights)
+    level = kmeans_1d(index, k=len(RISK_LABELS))
+
+    table = pd.DataFrame(components, columns=CVI_COMPONENTS)
+    table.insert(0, KEY, pcodes)
+    table["urban_risk_index"] = index
+    table["risk_level"] = level
+    table["risk_label"] = pd.Series(np.asarray(RISK_LABELS + [None], dtype=object)[level])
+    return table
+
+
+def compute_cvi(layers, weights=None):
+    """Recompute the CVI from the raw indicator layers."""
+    return score_components(*component_matrix(layers), weights)
+
+
+# ======================================================
+# CACHED ACCESSORS
+# ======================================================
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _cvi_components(digest):
+    return component_matrix({name: layer_properties(name) for name in LAYER_FILES})
+
+
+def cvi_components():
+    """(pcodes, normalized component matrix), once per data version (read-only)."""
+    return _cvi_components(table_version())
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _cvi_table(digest):
+    return score_components(*_cvi_components(digest))
+
+
+def cvi_table():
+    """The CVI with the default CVI_WEIGHTS, once per data version (read-only)."""
+    return _cvi_table(table_version())
+
+
+if __name__ == "__main__":
+    table = cvi_table()
+    shipped = layer_properties("urban").set_index(KEY).reindex(table[KEY])
+
+    for column in list(CVI_INDICATORS) + ["urban_risk_index"]:
+        diff = np.nanmax(np.abs(table[column].to_numpy() - shipped[column].to_numpy()))
+        print(f"{column:<24} max |diff| {diff:.2e}")
+    agree = (table["risk_label"].to_numpy() == shipped["risk_label"].to_numpy()).mean()
+    print(f"{'risk_label':<24} {agree:.1%} agree")
+
+    if len(sys.argv) > 1:
+        names = layer_properties("urban").set_index(KEY)["location_adm4_en"]
+        out = table.assign(location_adm4_en=names.reindex(table[KEY]).to_numpy())
+        out[list(RISK_TABLE_COLUMNS)].rename(columns=RISK_TABLE_COLUMNS).sort_values(
+            "Climate Vulnerability Index", ascending=False
+        ).to_csv(sys.argv[1], index=False)
+        print(f"Wrote {len(out)} barangays to {sys.argv[1]}")
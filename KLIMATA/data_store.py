@@ -0,0 +1,273 @@
+import json
+import math
+import os
+from collections import namedtuple
+
+import pandas as pd
+import pyarrow.parquet as pq
+import streamlit as st
+from shapely.geometry import mapping
+
+from build_data import (
+    BBOX_COLUMNS,
+    DATA_DIR,
+    GEOMETRY_TIERS,
+    KEY,
+    LAYER_FILES,
+    SEP,
+    base_digest,
+    build_barangay_table,
+    manifest_path,
+    source_hash,
+    table_path,
+    tier_column,
+    write_barangay_table,
+)
+from topology import to_topology
+
+# ======================================================
+# SHARED BARANGAY DATA STORE
+# ======================================================
+# Every page reads the barangay layers through this module. The four layers
+# are merged into one table (see build_data.py) that is loaded once per
+# process and shared by all sessions and pages, so callers must treat the
+# returned objects as read-only.
+#
+# geopandas (and with it GDAL/pyproj) is only imported once a geometry is
+# actually needed; attribute-only callers such as layer_properties() read the
+# table's plain columns with pandas.
+#
+# Versions: the table as a whole, its geometry and each layer's attributes
+# are versioned separately (see manifest()). Caches are keyed on the
+# narrowest version they depend on, so an ingested indicator update (see
+# ingest.py) only invalidates what reads the changed layer.
+
+GEOMETRY_COLUMNS = [tier_column("full")] + [tier_column(tier) for tier in GEOMETRY_TIERS]
+
+
+def layer_path(name):
+    return os.path.join(DATA_DIR, LAYER_FILES[name])
+
+
+def file_version(path):
+    """Cheap change marker for a file: (mtime in ns, size in bytes)."""
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def data_version():
+    """Combined version of every layer file, usable as a cache key."""
+    return tuple(file_version(layer_path(name)) for name in LAYER_FILES)
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _source_hash(version):
+    # Only re-hash the sources when a file's mtime/size changes
+    return source_hash()
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _manifest(source, version):
+    # `version` is the manifest file's (mtime, size); None before any ingest
+    if version is None:
+        return {"table": source, "geometry": source, "layers": dict.fromkeys(LAYER_FILES, source)}
+    with open(manifest_path(source), "r") as f:
+        return json.load(f)
+
+
+def manifest():
+    """Current versions: {"table": ..., "geometry": ..., "layers": {name: ...}}.
+
+    A fresh build has every version equal to the source hash; ingest.py
+    writes a manifest when it stores a revision of the table.
+    """
+    source = _source_hash(data_version())
+    path = manifest_path(source)
+    return _manifest(source, file_version(path) if os.path.exists(path) else None)
+
+
+def table_version():
+    """Version of the current table (any change to any column bumps it)."""
+    return manifest()["table"]
+
+
+def geometry_version():
+    """Version of the barangay polygons (only changes with the sources)."""
+    return manifest()["geometry"]
+
+
+def layer_version(name):
+    """Version of one layer's attribute columns."""
+    return manifest()["layers"][name]
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _load_table(digest):
+    import geopandas as gpd
+
+    path = table_path(digest)
+    if os.path.exists(path):
+        return gpd.read_parquet(path)
+    if base_digest(digest) != digest:
+        # An ingested revision can't be rebuilt from the sources
+        raise FileNotFoundError(path)
+
+    # No table for this version yet: build it, and keep it on disk when the
+    # app directory is writable.
+    table = build_barangay_table()
+    try:
+        write_barangay_table(table, digest)
+    except OSError:
+        pass
+    return table
+
+
+def load_table():
+    """The merged barangay GeoDataFrame (one row per adm4_pcode)."""
+    return _load_table(table_version())
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _load_properties(digest):
+    path = table_path(digest)
+    if not os.path.exists(path):
+        return pd.DataFrame(_load_table(digest).drop(columns=GEOMETRY_COLUMNS))
+    columns = [c for c in pq.read_schema(path).names if c not in GEOMETRY_COLUMNS]
+    return pd.read_parquet(path, columns=columns)
+
+
+def load_properties():
+    """The merged table without its geometry columns (plain DataFrame)."""
+    return _load_properties(table_version())
+
+
+def layer_frame(table, name):
+    """One layer's columns of a merged table, with their original property names."""
+    prefix = name + SEP
+    cols = [c for c in table.columns if c.startswith(prefix)]
+    props = table[[KEY] + cols].dropna(subset=cols, how="all")
+    return props.rename(columns={c: c[len(prefix):] for c in cols})
+
+
+def layer_properties(name):
+    """One layer's attribute columns with their original property names."""
+    return layer_frame(load_properties(), name)
+
+
+@st.cache_resource(show_spinner=False, max_entries=len(GEOMETRY_TIERS) + 1)
+def _geometries(geometry, tier):
+    table = load_table()
+    return dict(zip(table[KEY], (mapping(g) for g in table[tier_column(tier)])))
+
+
+@st.cache_resource(show_spinner=False, max_entries=len(LAYER_FILES) * (len(GEOMETRY_TIERS) + 1))
+def _layer_geojson(name, tier, version, geometry):
+    # Geometry dicts are shared between the four layers (and survive
+    # attribute updates), so the coordinates are only held in memory once
+    # per tier.
+    geometries = _geometries(geometry, tier)
+    features = [
+        {"type": "Feature", "properties": props, "geometry": geometries[props[KEY]]}
+        for props in layer_properties(name).to_dict("records")
+    ]
+    return {"type": "FeatureCollection", "features": features}
+
+
+def load_layer(name, tier="full"):
+    """Return one layer as a GeoJSON FeatureCollection (shared, read-only).
+
+    `tier` picks full-detail polygons or one of the simplified
+    GEOMETRY_TIERS; use tier_for_zoom() to choose it for a map.
+    """
+    return _layer_geojson(name, tier, layer_version(name), geometry_version())
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def _layer_topology(name, tier, properties, version, geometry):
+    return to_topology(_layer_geojson(name, tier, version, geometry), name, properties)
+
+
+def load_topology(name, tier="full", properties=None):
+    """One layer as quantized TopoJSON under objects.<name> (shared, read-only).
+
+    `properties` limits the attributes sent along with each geometry.
+    """
+    if properties is not None:
+        properties = tuple(properties)
+    return _layer_topology(name, tier, properties, layer_version(name), geometry_version())
+
+
+# Lookup tables over the barangays, built once per data version:
+#   names     - barangay names in table order (for select boxes)
+#   by_name   - location_adm4_en -> urban (climate_risk) feature
+#   by_pcode  - adm4_pcode -> urban feature
+#   bounds    - adm4_pcode -> [[south, west], [north, east]] for fit_bounds
+BarangayIndex = namedtuple("BarangayIndex", "names by_name by_pcode bounds")
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _barangay_index(version, geometry):
+    table = load_properties()
+    features = _layer_geojson("urban", "full", version, geometry)["features"]
+    by_pcode = {f["properties"][KEY]: f for f in features}
+    names = [f["properties"]["location_adm4_en"] for f in features]
+    by_name = {}
+    for name, feature in zip(names, features):
+        by_name.setdefault(name, feature)
+
+    # Precomputed in the build step (build_data.bounding_boxes)
+    minx, miny, maxx, maxy = table[BBOX_COLUMNS].to_numpy().T.tolist()
+    bounds = {
+        pcode: [[s, w], [n, e]]
+        for pcode, w, s, e, n in zip(table[KEY], minx, miny, maxx, maxy)
+    }
+    return BarangayIndex(names, by_name, by_pcode, bounds)
+
+
+def barangay_index():
+    """O(1) name/pcode lookups and bounds for every barangay (shared, read-only)."""
+    return _barangay_index(layer_version("urban"), geometry_version())
+
+
+def tier_for_zoom(zoom, latitude=10.72):
+    """Coarsest geometry tier that still looks exact at a Leaflet zoom level.
+
+    A tier is usable while its tolerance stays under about half a screen
+    pixel at that zoom (Web Mercator metres per pixel at `latitude`).
+    """
+    metres_per_pixel = 156543.03 * math.cos(math.radians(latitude)) / 2 ** zoom
+    usable = [
+        (tolerance, tier) for tier, tolerance in GEOMETRY_TIERS.items()
+        if tolerance * 111320 <= metres_per_pixel / 2
+    ]
+    return max(usable)[1] if usable else "full"
+
+
+def load_all_layers():
+    return {name: load_layer(name) for name in LAYER_FILES}
+
+
+# Column names as published in RISK_TABLE.csv
+RISK_TABLE_COLUMNS = {
+    "adm4_pcode": "adm4_pcode",
+    "ndvi_risk": "NDVI Risk",
+    "infra_risk": "Amenity Risk (Relative)",
+    "rwi_risk": "RWI Risk",
+    "coast_risk": "Coastal Distance Risk",
+    "pop_risk": "Population Risk",
+    "urban_risk_index": "Climate Vulnerability Index",
+    "risk_label": "Risk Label",
+    "location_adm4_en": "Barangay Name",
+}
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _risk_table(version):
+    props = layer_properties("urban")
+    table = props[list(RISK_TABLE_COLUMNS)].rename(columns=RISK_TABLE_COLUMNS)
+    return table.sort_values("Climate Vulnerability Index", ascending=False, ignore_index=True)
+
+
+def risk_table():
+    """CVI table for the Datasets page, highest risk first (shared, read-only)."""
+    return _risk_table(layer_version("urban"))
@@ -0,0 +1,597 @@
+"""Data layer of the Climate Resilience Forum (SQLite).
+
+Connections come from one pool per process (forum_pool), shared by every
+session: the schema is migrated once when the pool is created, the database
+runs in WAL mode so readers never block the writer, and a busy timeout makes
+concurrent writers wait for the lock instead of failing with "database is
+locked".
+
+The feed is read newest first with keyset pagination: a page is the posts
+strictly older than a cursor (timestamp, id), read from the
+posts_timestamp_id index with a LIMIT. Each page costs an index seek plus
+its own rows, however many posts the table holds; there are no OFFSET
+scans.
+
+Posts are tagged with the barangays they are about (post_barangays, see
+barangay_tags.py), and barangay_posts() reads one barangay's feed the same
+way as the main one.
+
+search_posts() finds posts by words in their text or author through the
+posts_fts full-text index, best matches first.
+
+New posts go through a write-behind queue (post_writer): the page hands the
+post to a background thread and returns at once; the thread commits whatever
+has queued up in one transaction, so a burst of posts costs a few commits
+instead of one per post.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+import streamlit as st
+
+from build_data import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+# Created and migrated on first run; local data, not tracked in git
+DB_PATH = os.path.join(DATA_DIR, "theforum.db")
+
+# Where the forum page used to create its database (next to the page file).
+# Posts found there are imported into DB_PATH once.
+LEGACY_DB_PATHS = [os.path.join(DATA_DIR, "pages", "theforum.db")]
+
+POOL_SIZE = 8
+BUSY_TIMEOUT_MS = 5000
+
+PAGE_SIZE = 20
+
+# Write-behind queue: posts waiting beyond MAX_PENDING make submit() wait up
+# to SUBMIT_TIMEOUT seconds (then fail) instead of growing memory; one
+# transaction commits at most BATCH_SIZE posts. A batch the database keeps
+# refusing is retried MAX_RETRIES times, waiting RETRY_DELAY seconds and
+# doubling up to MAX_RETRY_DELAY, then spooled to disk and retried every
+# SPOOL_RETRY_INTERVAL seconds. A batch that cannot even be spooled is
+# dropped; submit() then refuses posts for FAILURE_COOLDOWN seconds.
+MAX_PENDING = 10_000
+BATCH_SIZE = 500
+SUBMIT_TIMEOUT = 2.0
+MAX_RETRIES = 8
+RETRY_DELAY = 0.5
+MAX_RETRY_DELAY = 30.0
+FAILURE_COOLDOWN = 60.0
+SPOOL_RETRY_INTERVAL = 60.0
+
+Post = namedtuple("Post", "id username content timestamp")
+
+# Schema migrations, applied in order; PRAGMA user_version is the number
+# already applied. Append new steps, never edit old ones.
+MIGRATIONS = [
+    [
+        """
+        CREATE TABLE IF NOT EXISTS posts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT,
+            content TEXT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ],
+    ["CREATE INDEX IF NOT EXISTS posts_timestamp_id ON posts (timestamp, id)"],
+    [
+        # Full-text index over posts (external content: the text is only
+        # stored in posts), kept in sync by triggers and filled once
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+            username, content,
+            content='posts', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS posts_fts_insert AFTER INSERT ON posts BEGIN
+            INSERT INTO posts_fts (rowid, username, content) VALUES (new.id, new.username, new.content);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS posts_fts_delete AFTER DELETE ON posts BEGIN
+            INSERT INTO posts_fts (posts_fts, rowid, username, content)
+            VALUES ('delete', old.id, old.username, old.content);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS posts_fts_update AFTER UPDATE ON posts BEGIN
+            INSERT INTO posts_fts (posts_fts, rowid, username, content)
+            VALUES ('delete', old.id, old.username, old.content);
+            INSERT INTO posts_fts (rowid, username, content) VALUES (new.id, new.username, new.content);
+        END
+        """,
+        "INSERT INTO posts_fts (posts_fts) VALUES ('rebuild')",
+    ],
+    [
+        # Barangay tags. Keyed like the feed index, so one barangay's posts
+        # are read newest first straight from the primary key.
+        """
+        CREATE TABLE IF NOT EXISTS post_barangays (
+            adm4_pcode TEXT NOT NULL,
+            timestamp DATETIME NOT NULL,
+            post_id INTEGER NOT NULL,
+            PRIMARY KEY (adm4_pcode, timestamp, post_id)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS post_barangays_post ON post_barangays (post_id)",
+        """
+        CREATE TRIGGER IF NOT EXISTS post_barangays_delete AFTER DELETE ON posts BEGIN
+            DELETE FROM post_barangays WHERE post_id = old.id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS post_barangays_retime AFTER UPDATE OF timestamp ON posts BEGIN
+            UPDATE post_barangays SET timestamp = new.timestamp WHERE post_id = new.id;
+        END
+        """,
+    ],
+]
+
+# First schema version whose posts get barangay tags when written; older
+# posts are tagged from their content once, when the pool migrates
+TAGGED_SINCE_VERSION = 4
+
+
+# ======================================================
+# CONNECTIONS
+# ======================================================
+def open_connection(path):
+    conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    # Durable at every checkpoint; enough for a forum in WAL mode
+    conn.execute("PRAGMA synchronous = NORMAL")
+    return conn
+
+
+class ConnectionPool:
+    """Up to `size` SQLite connections, reused across sessions and reruns."""
+
+    def __init__(self, path, size=POOL_SIZE):
+        self.path = path
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection; waits while all `size` are in use."""
+        with self._slots:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = open_connection(self.path)
+            try:
+                yield conn
+            finally:
+                # Never hand a half-done transaction to the next borrower
+                if conn.in_transaction:
+                    conn.rollback()
+                self._idle.put(conn)
+
+
+def migrate(conn):
+    """Switch to WAL and apply pending MIGRATIONS; returns how many ran."""
+    # The journal mode is stored in the file, so this only changes it once
+    conn.execute("PRAGMA journal_mode = WAL")
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= len(MIGRATIONS):
+        return 0
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Re-read under the write lock: another process may have migrated
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for number, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+            for statement in statements:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {number}")
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return len(MIGRATIONS) - version
+
+
+def import_legacy(conn, path):
+    """Copy posts from an older database file that are not in `conn`'s yet.
+
+    The file is renamed to <path>.imported afterwards, so this runs once.
+    """
+    conn.execute("ATTACH DATABASE ? AS legacy", (path,))
+    try:
+        has_posts = conn.execute(
+            "SELECT 1 FROM legacy.sqlite_master WHERE type = 'table' AND name = 'posts'"
+        ).fetchone()
+        if has_posts:
+            with conn:
+                conn.execute(
+                    "INSERT INTO posts (username, content, timestamp) "
+                    "SELECT username, content, timestamp FROM legacy.posts AS old "
+                    "WHERE NOT EXISTS (SELECT 1 FROM posts AS p WHERE p.username IS old.username "
+                    "AND p.content IS old.content AND p.timestamp IS old.timestamp) "
+                    "ORDER BY timestamp, id"
+                )
+    finally:
+        conn.execute("DETACH DATABASE legacy")
+    try:
+        os.replace(path, path + ".imported")
+    except OSError:
+        pass
+
+
+@st.cache_resource(show_spinner=False)
+def _forum_pool(path):
+    pool = ConnectionPool(path)
+    with pool.connection() as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        migrate(conn)
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM posts").fetchone()[0]
+
+        # Posts that were written without tags: all of them on the first
+        # run with tagging, and any imported below
+        untagged_after = 0 if version < TAGGED_SINCE_VERSION else None
+        if path == DB_PATH:
+            for legacy in LEGACY_DB_PATHS:
+                if os.path.exists(legacy):
+                    import_legacy(conn, legacy)
+                    if untagged_after is None:
+                        untagged_after = last_id
+
+        if untagged_after is not None:
+            from barangay_tags import barangay_matcher
+
+            tag_posts(conn, barangay_matcher().match, after_id=untagged_after)
+    return pool
+
+
+def forum_pool(path=DB_PATH):
+    """The process-wide connection pool for `path`, migrated on first use."""
+    return _forum_pool(path)
+
+
+# ======================================================
+# POSTS
+# ======================================================
+def add_post(conn, username, content, pcodes=()):
+    """Insert one post now, tagged with `pcodes`; returns its id."""
+    return add_posts(conn, [(username, content, utc_timestamp(), pcodes)])[0]
+
+
+def add_posts(conn, rows):
+    """Insert (username, content, timestamp, pcodes) rows in one transaction.
+
+    Returns the new post ids.
+    """
+    ids = []
+    tags = []
+    with conn:
+        for username, content, timestamp, pcodes in rows:
+            post_id = conn.execute(
+                "INSERT INTO posts (username, content, timestamp) VALUES (?, ?, ?)", (username, content, timestamp)
+            ).lastrowid
+            ids.append(post_id)
+            tags.extend((pcode, timestamp, post_id) for pcode in pcodes)
+        conn.executemany(
+            "INSERT OR IGNORE INTO post_barangays (adm4_pcode, timestamp, post_id) VALUES (?, ?, ?)", tags
+        )
+    return ids
+
+
+def tag_posts(conn, match, after_id=0):
+    """Tag posts with id > `after_id` with the barangays `match` finds in them.
+
+    `match` maps a post's text to pcodes (see barangay_tags.py).
+    """
+    rows = conn.execute(
+        "SELECT id, COALESCE(timestamp, ''), content FROM posts WHERE id > ?", (after_id,)
+    ).fetchall()
+    tags = [(pcode, timestamp, post_id) for post_id, timestamp, content in rows for pcode in match(content)]
+    with conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO post_barangays (adm4_pcode, timestamp, post_id) VALUES (?, ?, ?)", tags
+        )
+    return len(tags)
+
+
+def recent_posts(conn, limit=PAGE_SIZE, before=None):
+    """Up to `limit` posts, newest first, older than the cursor `before`.
+
+    Returns (posts, cursor). Pass the cursor back as `before` to get the
+    next (older) page; it is None once there are no older posts.
+    """
+    if before is None:
+        rows = conn.execute(
+            "SELECT id, username, content, timestamp FROM posts "
+            "ORDER BY timestamp DESC, id DESC LIMIT ?",
+            (limit + 1,),
+        ).fetchall()
+    else:
+        rows = conn.execute(
+            "SELECT id, username, content, timestamp FROM posts "
+            "WHERE (timestamp, id) < (?, ?) "
+            "ORDER BY timestamp DESC, id DESC LIMIT ?",
+            (*before, limit + 1),
+        ).fetchall()
+
+    posts = [Post(*row) for row in rows[:limit]]
+    # One extra row was read to know whether an older page exists
+    cursor = (posts[-1].timestamp, posts[-1].id) if len(rows) > limit else None
+    return posts, cursor
+
+
+def barangay_posts(conn, pcode, limit=PAGE_SIZE, before=None):
+    """Like recent_posts, for the posts tagged with barangay `pcode`."""
+    if before is None:
+        rows = conn.execute(
+            "SELECT p.id, p.username, p.content, p.timestamp "
+            "FROM post_barangays AS t JOIN posts AS p ON p.id = t.post_id "
+            "WHERE t.adm4_pcode = ? "
+            "ORDER BY t.timestamp DESC, t.post_id DESC LIMIT ?",
+            (pcode, limit + 1),
+        ).fetchall()
+    else:
+        rows = conn.execute(
+            "SELECT p.id, p.username, p.content, p.timestamp "
+            "FROM post_barangays AS t JOIN posts AS p ON p.id = t.post_id "
+            "WHERE t.adm4_pcode = ? AND (t.timestamp, t.post_id) < (?, ?) "
+            "ORDER BY t.timestamp DESC, t.post_id DESC LIMIT ?",
+            (pcode, *before, limit + 1),
+        ).fetchall()
+
+    posts = [Post(*row) for row in rows[:limit]]
+    cursor = (posts[-1].timestamp, posts[-1].id) if len(rows) > limit else None
+    return posts, cursor
+
+
+# ======================================================
+# SEARCH
+# ======================================================
+def fts_query(text):
+    """FTS5 query matching posts that contain every word of `text`.
+
+    Words are quoted, so punctuation and FTS5 operators typed by users are
+    searched for literally; the last word also matches as a prefix (search
+    as you type: "flo" finds "flood").
+    """
+    words = ['"' + word.replace('"', '""') + '"' for word in text.split()]
+    if words:
+        words[-1] += "*"
+    return " ".join(words)
+
+
+def search_posts(conn, text, limit=PAGE_SIZE, offset=0):
+    """Posts matching `text`, best match (BM25) first, newest first on ties.
+
+    Returns (posts, more): `more` tells whether results beyond this page
+    exist. Matches in the content are wrapped in <mark>.
+    """
+    query = fts_query(text)
+    if not query:
+        return [], False
+    rows = conn.execute(
+        "SELECT p.id, p.username, highlight(posts_fts, 1, '<mark>', '</mark>'), p.timestamp "
+        "FROM posts_fts JOIN posts AS p ON p.id = posts_fts.rowid "
+        "WHERE posts_fts MATCH ? "
+        "ORDER BY posts_fts.rank, p.timestamp DESC, p.id DESC LIMIT ? OFFSET ?",
+        (query, limit + 1, offset),
+    ).fetchall()
+    return [Post(*row) for row in rows[:limit]], len(rows) > limit
+
+
+# ======================================================
+# WRITE-BEHIND QUEUE
+# ======================================================
+def utc_timestamp():
+    """Now, formatted like SQLite's CURRENT_TIMESTAMP."""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime())
+
+
+class PostWriter:
+    """Background thread that commits queued posts in batches.
+
+    submit() returns as soon as the post is queued. The thread takes
+    everything queued so far (up to BATCH_SIZE), inserts it in one
+    transaction and retries the same batch with backoff if the database
+    fails. A batch that still fails after MAX_RETRIES is appended to
+    `spool_path` (JSON lines) and committed later: when the writer starts,
+    after the next batch that commits, and every SPOOL_RETRY_INTERVAL
+    seconds while idle. Only a batch that cannot be spooled either is
+    dropped; `error` then holds the exception (until a batch commits) and
+    submit() refuses new posts for FAILURE_COOLDOWN seconds. close()
+    (registered with atexit) stops taking posts and flushes the rest; only a
+    hard kill of the process loses posts still in the queue.
+
+    pending() shows every post not committed yet. Committing a batch and
+    taking it out of that view happen under one lock, so a page that reads
+    the database and then pending() never gets a post twice.
+    """
+
+    _STOP = object()
+
+    def __init__(self, pool, max_pending=MAX_PENDING, batch_size=BATCH_SIZE, spool_path=None):
+        self.pool = pool
+        self.batch_size = batch_size
+        self.spool_path = spool_path
+        self._queue = queue.Queue(max_pending)
+        self._pending_lock = threading.Lock()
+        self._in_flight = []
+        self._spooled = self._read_spool()
+        self._closed = False
+        self.error = None
+        self._failed_at = None
+        self._thread = threading.Thread(target=self._run, name="forum-post-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, username, content, pcodes=(), timeout=SUBMIT_TIMEOUT):
+        """Queue a post tagged with barangays `pcodes`, stamped with the current time.
+
+        Raises queue.Full if the queue stays full for `timeout` seconds
+        (backpressure), RuntimeError once the writer is closed or within
+        FAILURE_COOLDOWN of a dropped batch.
+        """
+        if self._closed:
+            raise RuntimeError("The post writer is closed")
+        if self.error is not None and time.monotonic() - self._failed_at < FAILURE_COOLDOWN:
+            raise RuntimeError(f"The post writer cannot commit posts: {self.error}")
+        self._queue.put((username, content, utc_timestamp(), tuple(pcodes)), timeout=timeout)
+
+    def pending(self, limit=PAGE_SIZE):
+        """Newest queued, spooled or uncommitted posts (id None), newest first."""
+        with self._pending_lock, self._queue.mutex:
+            rows = self._spooled + self._in_flight + list(self._queue.queue)
+        rows = [row for row in rows if row is not self._STOP][-limit:]
+        return [Post(None, *row[:3]) for row in reversed(rows)]
+
+    def flush(self, timeout=None):
+        """Wait until every queued post is committed or spooled; False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout=None):
+        """Stop accepting posts and commit the ones already queued."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(self._STOP)
+        self._thread.join(timeout)
+
+    def _run(self):
+        self._replay_spool()
+        stopping = False
+        while True:
+            # After the stop marker, drain what is left without blocking;
+            # while posts are spooled, wake up now and then to retry them
+            try:
+                timeout = SPOOL_RETRY_INTERVAL if self._spooled else None
+                batch = [self._queue.get(block=not stopping, timeout=timeout)]
+            except queue.Empty:
+                self._replay_spool()
+                if stopping:
+                    return
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stopping = stopping or any(row is self._STOP for row in batch)
+            rows = [row for row in batch if row is not self._STOP]
+            with self._pending_lock, self._queue.mutex:
+                self._in_flight = rows
+            try:
+                if rows:
+                    self._commit(rows, self._clear_in_flight)
+                    self.error = None
+                    self._replay_spool()
+            except Exception as e:
+                logger.warning("Could not commit %d forum post(s) (%s); spooling them", len(rows), e)
+                self._spool(rows)
+            finally:
+                self._clear_in_flight()
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _commit(self, rows, committed, retries=MAX_RETRIES):
+        # Retry database errors with capped exponential backoff; re-raise
+        # the last one once `retries` are used up. `committed` runs under
+        # the pending lock together with the commit.
+        for attempt in range(retries + 1):
+            try:
+                with self.pool.connection() as conn, self._pending_lock:
+                    add_posts(conn, rows)
+                    committed()
+                return
+            except sqlite3.Error as e:
+                if attempt == retries:
+                    raise
+                delay = min(RETRY_DELAY * 2 ** attempt, MAX_RETRY_DELAY)
+                logger.warning("Committing %d forum post(s) failed (%s); retrying in %.1fs", len(rows), e, delay)
+                time.sleep(delay)
+
+    def _clear_in_flight(self):
+        with self._queue.mutex:
+            self._in_flight = []
+
+    # ------------------------------------------------------
+    # Spool of batches the database refused
+    # ------------------------------------------------------
+    def _read_spool(self):
+        if self.spool_path is None or not os.path.exists(self.spool_path):
+            return []
+        rows = []
+        with open(self.spool_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    username, content, timestamp, pcodes = json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash mid-write
+                    logger.warning("Skipping an unreadable line in %s", self.spool_path)
+                    continue
+                rows.append((username, content, timestamp, tuple(pcodes)))
+        return rows
+
+    def _spool(self, rows):
+        try:
+            if self.spool_path is None:
+                raise RuntimeError("no spool file configured")
+            with open(self.spool_path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(list(row), ensure_ascii=False) + "\n" for row in rows)
+        except Exception as e:
+            logger.exception("Dropped %d forum post(s) that could not be committed or spooled", len(rows))
+            self.error = e
+            self._failed_at = time.monotonic()
+            return
+        with self._pending_lock, self._queue.mutex:
+            self._spooled = self._spooled + rows
+            self._in_flight = []
+
+    def _replay_spool(self):
+        """Commit the spooled posts in one go; they stay spooled if that fails."""
+        if not self._spooled:
+            return
+        try:
+            self._commit(self._spooled, self._clear_spool, retries=0)
+        except Exception as e:
+            logger.warning("Could not commit %d spooled forum post(s) (%s)", len(self._spooled), e)
+        else:
+            logger.info("Committed spooled forum posts")
+
+    def _clear_spool(self):
+        # The posts are committed at this point, so a file that cannot be
+        # removed must not make the replay count as failed
+        try:
+            os.remove(self.spool_path)
+        except OSError:
+            logger.exception("Could not remove %s; its posts are already committed", self.spool_path)
+        with self._queue.mutex:
+            self._spooled = []
+
+
+@st.cache_resource(show_spinner=False)
+def _post_writer(path):
+    writer = PostWriter(forum_pool(path), spool_path=path + ".unsaved.jsonl")
+    atexit.register(writer.close)
+    return writer
+
+
+def post_writer(path=DB_PATH):
+    """The process-wide write-behind queue for posts to `path`."""
+    return _post_writer(path)
@@ -0,0 +1,223 @@
+"""Incremental indicator updates (e.g. a daily heat index / rainfall / PM2.5
+snapshot) without regenerating the GeoJSON layers.
+
+Run from the repo root:
+
+    python KLIMATA/ingest.py updates.csv --layer climate
+
+The update table is keyed by adm4_pcode. Its columns are property names of
+`--layer`, or namespaced "<layer>__<property>" names; empty cells are left
+alone. Only cells that actually differ from the current table count as
+changes. If any CVI input changed (see cvi.CVI_INDICATORS and
+climate_exposure_score), the CVI columns of the urban layer are recomputed
+from the updated inputs.
+
+climate_exposure_score is taken as delivered: its formula is not part of
+this project, so an update that should move it has to include it.
+
+The result is stored as a new revision of the current table (build/) and the
+manifest (see data_store.manifest) records which layers changed. The running
+app picks it up on its next rerun. Only caches that depend on a changed layer
+are rebuilt; geometry, the spatial index and untouched layers' maps stay
+cached.
+"""
+import argparse
+import glob
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from build_data import (
+    BBOX_COLUMNS,
+    BUILD_DIR,
+    KEY,
+    LAYER_FILES,
+    SEP,
+    base_digest,
+    manifest_path,
+    revision_digest,
+    table_path,
+)
+from cvi import CLIMATE_EXPOSURE, CVI_COMPONENTS, CVI_INDICATORS, compute_cvi
+from data_store import GEOMETRY_COLUMNS, layer_frame, load_table, manifest
+
+# Merged-table columns that feed the CVI
+CVI_INPUTS = {f"{layer}{SEP}{column}" for layer, column, _ in CVI_INDICATORS.values()} | {
+    f"{CLIMATE_EXPOSURE[0]}{SEP}{CLIMATE_EXPOSURE[1]}"
+}
+
+# CVI output -> urban layer column it is stored in
+CVI_OUTPUTS = {name: f"urban{SEP}{name}" for name in CVI_COMPONENTS + ["urban_risk_index", "risk_level", "risk_label"]}
+
+# Raw values the urban layer keeps a copy of: urban column -> source column
+MIRRORED_COLUMNS = {f"urban{SEP}infra_index": f"infra{SEP}infra_index"}
+
+# changes: one row per changed cell (KEY, column, old, new, derived)
+IngestReport = namedtuple("IngestReport", "version changes layers unknown_pcodes")
+
+
+# ======================================================
+# DIFF
+# ======================================================
+def normalize_updates(updates, layer=None):
+    """Index `updates` by adm4_pcode with namespaced column names."""
+    if KEY not in updates.columns:
+        raise ValueError(f"Update table has no {KEY} column")
+    if updates[KEY].duplicated().any():
+        raise ValueError(f"Duplicate {KEY} values in update table")
+
+    updates = updates.set_index(KEY)
+    if layer is not None:
+        if layer not in LAYER_FILES:
+            raise ValueError(f"Unknown layer: {layer}")
+        updates = updates.rename(columns=lambda c: c if SEP in c else f"{layer}{SEP}{c}")
+
+    protected = set(GEOMETRY_COLUMNS) | set(BBOX_COLUMNS)
+    bad = [c for c in updates.columns if c in protected or c.split(SEP)[0] not in LAYER_FILES]
+    if bad:
+        raise ValueError(f"Not updatable: {', '.join(bad)}")
+    return updates
+
+
+def diff_cells(current, updates):
+    """Cells of `updates` that differ from `current` (both indexed by pcode).
+
+    Returns a long DataFrame (KEY, column, old, new). Missing update values
+    are not changes; numbers are compared with a small tolerance.
+    """
+    frames = []
+    for column in updates.columns:
+        new = updates[column].dropna()
+        old = current[column].reindex(new.index) if column in current else pd.Series(np.nan, index=new.index)
+        if pd.api.types.is_numeric_dtype(new) and pd.api.types.is_numeric_dtype(old):
+            changed = ~np.isclose(new.to_numpy(float), old.to_numpy(float), rtol=1e-9, atol=1e-12, equal_nan=False)
+        else:
+            changed = (new.astype(str) != old.astype(str)).to_numpy() | old.isna().to_numpy()
+        if changed.any():
+            frames.append(pd.DataFrame({
+                KEY: new.index[changed],
+                "column": column,
+                "old": old[changed].to_numpy(dtype=object),
+                "new": new[changed].to_numpy(dtype=object),
+            }))
+    if not frames:
+        return pd.DataFrame(columns=[KEY, "column", "old", "new"])
+    return pd.concat(frames, ignore_index=True)
+
+
+def _apply(table, changes):
+    """Write changed cells into `table` (indexed by pcode), column by column."""
+    for column, cells in changes.groupby("column", sort=False):
+        values = pd.Series(cells["new"].to_numpy(), index=cells[KEY].to_numpy())
+        if column not in table:
+            table[column] = np.nan
+        if pd.api.types.is_numeric_dtype(table[column]):
+            values = pd.to_numeric(values)
+        elif pd.api.types.is_string_dtype(table[column]):
+            values = values.astype(str)
+        table.loc[values.index, column] = values
+
+
+# ======================================================
+# DERIVED SCORES
+# ======================================================
+def derived_updates(table):
+    """Recomputed CVI and mirrored columns for the whole (updated) table."""
+    merged = table.reset_index()
+    cvi = compute_cvi({name: layer_frame(merged, name) for name in LAYER_FILES}).set_index(KEY)
+
+    derived = pd.DataFrame(index=table.index)
+    for name, column in CVI_OUTPUTS.items():
+        derived[column] = cvi[name].reindex(table.index)
+
+    # Keep the shipped cluster ids: map each new risk label to the id that
+    # label already had
+    cluster = f"urban{SEP}cluster"
+    if cluster in table:
+        ids = table.dropna(subset=[cluster]).groupby(f"urban{SEP}risk_label")[cluster].first()
+        derived[cluster] = derived[CVI_OUTPUTS["risk_label"]].map(ids)
+
+    for target, source in MIRRORED_COLUMNS.items():
+        derived[target] = table[source]
+    return derived
+
+
+# ======================================================
+# INGEST
+# ======================================================
+def ingest(updates, layer=None):
+    """Apply an indicator update table and store the new table revision."""
+    updates = normalize_updates(updates, layer)
+    table = load_table().set_index(KEY)
+
+    unknown = updates.index.difference(table.index)
+    updates = updates.drop(index=unknown)
+
+    changes = diff_cells(table, updates).assign(derived=False)
+    _apply(table, changes)
+
+    if changes["column"].isin(CVI_INPUTS).any() or changes["column"].isin(MIRRORED_COLUMNS.values()).any():
+        derived = diff_cells(table, derived_updates(table)).assign(derived=True)
+        _apply(table, derived)
+        changes = pd.concat([changes, derived], ignore_index=True)
+
+    versions = manifest()
+    if changes.empty:
+        return IngestReport(versions["table"], changes, [], list(unknown))
+
+    layers = sorted({column.split(SEP)[0] for column in changes["column"]})
+    version = _store_revision(table.reset_index(), versions, layers)
+    return IngestReport(version, changes, layers, list(unknown))
+
+
+def _store_revision(table, versions, layers):
+    """Write the table as the next revision and point the manifest at it."""
+    source = versions["geometry"]
+    previous = versions["table"]
+    revision = 1 if previous == source else int(previous.split(".")[-1]) + 1
+    digest = revision_digest(source, revision)
+
+    os.makedirs(BUILD_DIR, exist_ok=True)
+    table.to_parquet(table_path(digest), index=False)
+
+    updated = {
+        "table": digest,
+        "geometry": source,
+        "layers": {name: digest if name in layers else v for name, v in versions["layers"].items()},
+    }
+    tmp = manifest_path(source) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(updated, f, indent=2)
+    os.replace(tmp, manifest_path(source))
+
+    # Older revisions are no longer referenced; the source build stays so
+    # the chain can be restarted by deleting the manifest
+    for old in glob.glob(os.path.join(BUILD_DIR, f"barangays-{source}.*.parquet")):
+        if old != table_path(digest) and base_digest(os.path.basename(old)[len("barangays-"):]) == source:
+            os.remove(old)
+    return digest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("updates", help="CSV or Parquet table keyed by adm4_pcode")
+    parser.add_argument("--layer", choices=list(LAYER_FILES), help="layer of un-prefixed columns")
+    args = parser.parse_args()
+
+    if args.updates.endswith(".parquet"):
+        updates = pd.read_parquet(args.updates)
+    else:
+        updates = pd.read_csv(args.updates)
+    report = ingest(updates, args.layer)
+
+    if report.unknown_pcodes:
+        print(f"Skipped {len(report.unknown_pcodes)} unknown {KEY}s: {', '.join(report.unknown_pcodes[:10])}")
+    if report.changes.empty:
+        print("No changes.")
+    else:
+        direct = (~report.changes["derived"]).sum()
+        print(f"{direct} changed cells, {len(report.changes) - direct} derived cells "
+              f"in layers {', '.join(report.layers)} -> table version {report.version}")
@@ -0,0 +1,113 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from build_data import KEY, LAYER_FILES
+from data_store import layer_properties, table_version
+
+# ======================================================
+# KPI DEFINITIONS
+# ======================================================
+# A KPI is one aggregate of one layer column:
+#   stat - any pandas reduction ("sum", "mean", "min", "max", "count",
+#          "median", ...), "label:<value>" to count rows equal to <value>,
+#          or "pop_weighted_mean" to weight each barangay by its population
+#          (e.g. the share of the city's people within reach of a facility)
+#   fmt  - format string for the KPI card
+# Adding a KPI is one entry here; all of them are computed together, once per
+# data version.
+KPI = namedtuple("KPI", "layer column stat fmt")
+
+KPIS = {
+    # Climate Vulnerability
+    "barangays": KPI("urban", KEY, "count", "{:,.0f}"),
+    "low_risk": KPI("urban", "risk_label", "label:Low Risk", "{:,.0f}"),
+    "medium_risk": KPI("urban", "risk_label", "label:Medium Risk", "{:,.0f}"),
+    "high_risk": KPI("urban", "risk_label", "label:High Risk", "{:,.0f}"),
+    "mean_cvi": KPI("urban", "urban_risk_index", "mean", "{:.3f}"),
+
+    # Population
+    "population": KPI("pop", "pop_count_total", "sum", "{:,.0f}"),
+    "population_mean": KPI("pop", "pop_count_total", "mean", "{:.2f}"),
+    "population_max": KPI("pop", "pop_count_total", "max", "{:.2f}"),
+    "population_min": KPI("pop", "pop_count_total", "min", "{:.2f}"),
+
+    # Amenity Risk
+    "shelter_distance": KPI("infra", "shelter_nearest", "mean", "{:.2f}m"),
+    "community_centre_distance": KPI("infra", "community_centre_nearest", "mean", "{:.2f}m"),
+    "health_center_5min": KPI("infra", "brgy_healthcenter_pop_reached_pct_5min", "pop_weighted_mean", "{:.2f}%"),
+    "hospital_5min": KPI("infra", "hospital_pop_reached_pct_5min", "pop_weighted_mean", "{:.2f}%"),
+
+    # Climate Exposure
+    "heat_index": KPI("climate", "heat_index", "mean", "{:.2f}°C"),
+    "rainfall": KPI("climate", "pr", "mean", "{:.2f}mm"),
+    "pm25": KPI("climate", "pm25", "mean", "{:.2f}"),
+    "pm10": KPI("climate", "pm10", "mean", "{:.2f}"),
+}
+
+# Barangay population used by "pop_weighted_mean"
+POPULATION = ("pop", "pop_count_total")
+
+
+# ======================================================
+# KPI ENGINE
+# ======================================================
+def compute_kpis(layers, kpis=KPIS):
+    """Evaluate every KPI against {layer: DataFrame}; returns {name: float}.
+
+    Plain reductions are batched into one DataFrame.agg call per layer, and
+    label counts into one value_counts per column.
+    """
+    values = {}
+    weights = None
+    for layer in {kpi.layer for kpi in kpis.values()}:
+        props = layers[layer]
+        specs = {name: kpi for name, kpi in kpis.items() if kpi.layer == layer}
+
+        reductions = {}
+        for kpi in specs.values():
+            if kpi.stat != "pop_weighted_mean" and not kpi.stat.startswith("label:"):
+                reductions.setdefault(kpi.column, []).append(kpi.stat)
+        aggregated = props.agg(reductions) if reductions else None
+
+        label_counts = {
+            column: props[column].value_counts()
+            for column in {kpi.column for kpi in specs.values() if kpi.stat.startswith("label:")}
+        }
+
+        for name, kpi in specs.items():
+            if kpi.stat.startswith("label:"):
+                values[name] = label_counts[kpi.column].get(kpi.stat[len("label:"):], 0)
+            elif kpi.stat == "pop_weighted_mean":
+                if weights is None:
+                    population = layers[POPULATION[0]]
+                    weights = population.set_index(KEY)[POPULATION[1]]
+                w = weights.reindex(props[KEY]).to_numpy(dtype=float)
+                x = props[kpi.column].to_numpy(dtype=float)
+                valid = np.isfinite(x) & np.isfinite(w)
+                values[name] = np.average(x[valid], weights=w[valid]) if w[valid].sum() > 0 else np.nan
+            else:
+                values[name] = aggregated.loc[kpi.stat, kpi.column]
+
+    return {name: float(values[name]) for name in kpis}
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _kpi_values(digest):
+    return compute_kpis({name: layer_properties(name) for name in LAYER_FILES})
+
+
+def kpi_values():
+    """Every KPI in KPIS, computed once per data version (shared, read-only)."""
+    return _kpi_values(table_version())
+
+
+def format_kpi(name, value):
+    """`value` formatted for the KPI's card ("-" when it can't be computed)."""
+    return "-" if pd.isna(value) else KPIS[name].fmt.format(value)
+
+
+def kpi_text(name):
+    return format_kpi(name, kpi_values()[name])
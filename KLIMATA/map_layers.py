@@ -0,0 +1,179 @@
+import json
+import os
+
+import folium
+import numpy as np
+import pandas as pd
+from branca.element import MacroElement
+from folium.plugins import VectorGridProtobuf
+from jinja2 import Template
+
+from build_data import BUILD_DIR, KEY
+from data_store import load_layer, load_topology
+
+# ======================================================
+# BARANGAY MAP LAYERS
+# ======================================================
+# "topojson": shared borders sent once, quantized to ~1 m and decoded in
+#             the browser (see topology.py)
+# "geojson":  the layer embedded as plain inline GeoJSON
+# "mvt":      only the visible vector tiles are fetched from the local
+#             tile server (see tile_server.py)
+MAP_ENCODING = os.environ.get("KLIMATA_MAP_ENCODING", "topojson")
+
+# Every map rendered through map_html() is also exported here as a
+# standalone page (e.g. build/maps/population_layer.html)
+MAP_DIR = os.path.join(BUILD_DIR, "maps")
+
+
+def map_html(m, export_name=None):
+    """Serialize a folium map to a standalone HTML document.
+
+    With `export_name`, the document is also written to MAP_DIR so the
+    offline copy always matches what the app serves.
+    """
+    html = m.get_root().render()
+    if export_name:
+        slug = "".join(c if c.isalnum() else "_" for c in export_name.lower())
+        try:
+            os.makedirs(MAP_DIR, exist_ok=True)
+            with open(os.path.join(MAP_DIR, f"{slug}.html"), "w", encoding="utf-8") as f:
+                f.write(html)
+        except OSError:
+            pass
+    return html
+
+
+class VectorGridTooltip(MacroElement):
+    """Hover tooltip for a VectorGridProtobuf layer, like GeoJsonTooltip."""
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var fields = {{ this.fields|tojson }};
+            var aliases = {{ this.aliases|tojson }};
+            var tooltip = L.tooltip({sticky: true});
+            {{ this._parent.get_name() }}.on("mouseover mousemove", function(e) {
+                var rows = fields.map(function(field, i) {
+                    var value = e.layer.properties[field];
+                    if (typeof value === "number") { value = value.toLocaleString(); }
+                    return "<tr><th>" + aliases[i] + "</th><td>" + (value === undefined ? "" : value) + "</td></tr>";
+                });
+                tooltip.setLatLng(e.latlng).setContent("<table>" + rows.join("") + "</table>")
+                    .openOn({{ this._parent._parent.get_name() }});
+            });
+            {{ this._parent.get_name() }}.on("mouseout", function() {
+                {{ this._parent._parent.get_name() }}.closeTooltip(tooltip);
+            });
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, fields, aliases):
+        super().__init__()
+        self._name = "VectorGridTooltip"
+        self.fields = list(fields)
+        self.aliases = list(aliases)
+
+
+def style_table(props, fill_colors, **style):
+    """Per-barangay Leaflet path styles as a DataFrame indexed by adm4_pcode.
+
+    `fill_colors` is one colour per row of `props` (computed column-wise,
+    e.g. with np.digitize); `style` holds the options shared by all rows.
+    """
+    return pd.DataFrame(
+        {"fillColor": np.asarray(fill_colors), **style},
+        index=pd.Index(props[KEY], name=KEY),
+    )
+
+
+def vector_tile_layer(layer, name, styles, fields, aliases):
+    """Leaflet.VectorGrid layer backed by the local tile server."""
+    from tile_server import publish, start_tile_server, tile_url
+
+    start_tile_server()
+    key = publish(layer, fields, styles)
+
+    # Each tile feature carries its own Leaflet style (see tile_server.render_tile)
+    options = """{
+        "interactive": true,
+        "vectorTileLayerStyles": {%s: function(p) {
+            return {fill: true, fillColor: p.fillColor, fillOpacity: p.fillOpacity,
+                    color: p.color, weight: p.weight};
+        }}
+    }""" % json.dumps(layer)
+
+    tiles = VectorGridProtobuf(tile_url(key), name=name, options=options)
+    tiles.add_child(VectorGridTooltip(fields, aliases))
+    return tiles
+
+
+def barangay_layer(layer, tier, name, styles, fields, aliases, encoding=MAP_ENCODING):
+    """Build the folium layer for one barangay layer with its tooltip.
+
+    `styles` is a style_table(); each polygon's style is looked up by
+    adm4_pcode instead of being computed by a per-feature callback.
+    """
+    styles = styles.to_dict("index")
+
+    if encoding == "mvt":
+        return vector_tile_layer(layer, name, styles, fields, aliases)
+
+    tooltip = folium.GeoJsonTooltip(fields=fields, aliases=aliases, localize=True)
+
+    if encoding == "geojson":
+        return folium.GeoJson(
+            load_layer(layer, tier),
+            name=name,
+            style_function=lambda f: styles.get(f["properties"][KEY], {}),
+            tooltip=tooltip,
+        )
+
+    topology = load_topology(layer, tier, [KEY] + list(fields))
+    # folium.TopoJson reads each polygon's style from properties["style"];
+    # fill it in on copies so the shared cached topology is left untouched.
+    geometries = [
+        dict(geometry, properties=dict(geometry["properties"], style=styles.get(geometry["properties"][KEY], {})))
+        for geometry in topology["objects"][layer]["geometries"]
+    ]
+    topology = dict(topology, objects={layer: {"type": "GeometryCollection", "geometries": geometries}})
+
+    return folium.TopoJson(
+        topology,
+        f"objects.{layer}",
+        name=name,
+        tooltip=tooltip,
+    )
+
+
+# Applied in the browser to an already-rendered GeoJson/TopoJson layer:
+# restyles polygons and updates the properties their tooltips show, by pcode.
+RESTYLE_SCRIPT = """
+<script>
+(function() {
+    var layer = %(layer)s, styles = %(styles)s, properties = %(properties)s;
+    layer.eachLayer(function(l) {
+        var pcode = l.feature.properties[%(key)s];
+        if (pcode in styles) { l.setStyle(styles[pcode]); }
+        if (pcode in properties) { Object.assign(l.feature.properties, properties[pcode]); }
+    });
+})();
+</script>
+"""
+
+
+def restyle_layer(html, layer_name, styles, properties=None):
+    """Return map HTML with a layer's styles (and tooltip values) replaced.
+
+    `styles` is a style_table() and `properties` an optional DataFrame
+    indexed by adm4_pcode. The cached `html` is reused as-is, so a new
+    styling costs a string concatenation instead of rebuilding the map.
+    """
+    script = RESTYLE_SCRIPT % {
+        "layer": layer_name,
+        "key": json.dumps(KEY),
+        "styles": styles.to_json(orient="index"),
+        "properties": "{}" if properties is None else properties.to_json(orient="index"),
+    }
+    return html.replace("</html>", script + "</html>")
@@ -1,14 +1,15 @@
 import streamlit as st
-import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import geopandas as gpd
 import folium
-from streamlit_folium import st_folium
-import json
 import streamlit.components.v1 as components
 import math 
-import os
+import html
+import threading
+from streamlit_folium import generate_leaflet_string, st_folium
+from data_store import barangay_index, geometry_version, layer_properties, layer_version, tier_for_zoom
+from forum import barangay_posts, forum_pool
+from map_layers import MAP_ENCODING, barangay_layer, style_table
+from spatial_index import spatial_index
 
 st.set_page_config(layout="wide")
 st.title("Barangay Overview")
@@ -78,21 +79,21 @@ section[data-testid="stSidebar"] .stSelectbox .css-1wa3eu0-placeholder {
 </style>
 """, unsafe_allow_html=True)
 
-# --- Load Urban Risk GeoJSON ---
-# Get the parent directory (go up one level from pages/ to main KLIMATA directory)
-script_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-
+# --- Load Urban Risk barangay index ---
+# Name/pcode lookups over climate_risk.geojson, built once per process (see data_store.py)
 try:
-    with open(os.path.join(script_dir, "climate_risk.geojson"), "r") as f:
-        urban = json.load(f)
+    index = barangay_index()
 except FileNotFoundError as e:
     st.error(f"Error loading data file: {e}")
     st.info("Please ensure climate_risk.geojson is in the KLIMATA directory")
     st.stop()
 
 # --- Sidebar: search for barangay ---
-barangay_names = [feature['properties']['location_adm4_en'] for feature in urban['features']]
-selected_barangay = st.sidebar.selectbox("Select Barangay", barangay_names)
+barangay_names = index.names
+# A barangay clicked on the map (see below) becomes the new selection
+if "clicked_barangay" in st.session_state:
+    st.session_state["selected_barangay"] = st.session_state.pop("clicked_barangay")
+selected_barangay = st.sidebar.selectbox("Select Barangay", barangay_names, key="selected_barangay")
 
 street_view_urls = {
     "Abeto Mirasol Taft South (Quirino Abeto)": "https://www.google.com/maps/embed?pb=!3m2!1sen!2sph!4v1763696870421!5m2!1sen!2sph!6m8!1m7!1stjjgARVYVGHayI6K7yuAVw!2m2!1d10.71777077160674!2d122.5442758454376!3f142.47798!4f0!5f0.7820865974627469",
@@ -279,10 +280,7 @@ street_view_urls = {
 
 # --- Find selected barangay feature + extract KPI values ---
 if selected_barangay != "--Select--":
-    selected_feature = next(
-        f for f in urban['features']
-        if f['properties']['location_adm4_en'] == selected_barangay
-    )
+    selected_feature = index.by_name[selected_barangay]
     props = selected_feature['properties']
     brgy_name_val = props.get("location_adm4_en", "N/A")
 
@@ -388,70 +386,109 @@ with col4:
 
 
 st.markdown("<div style='height:20px'></div>", unsafe_allow_html=True)
-# --- Base Map ---
-m = folium.Map(location=[10.72, 122.55], zoom_start=13)
-
-# --- Function to get bounds of a feature ---
-def get_bounds(feature):
-    geom = feature['geometry']
-    if geom['type'] == "Polygon":
-        coords = geom['coordinates'][0]
-    elif geom['type'] == "MultiPolygon":
-        coords = geom['coordinates'][0][0]
-    else:
-        coords = [(0,0)]
-    lats = [c[1] for c in coords]
-    lons = [c[0] for c in coords]
-    return [[min(lats), min(lons)], [max(lats), max(lons)]]
-
-# --- Add Urban Risk Layer ---
-for feature in urban['features']:
-    name = feature['properties']['location_adm4_en']
-    if selected_barangay == "--Select--" or selected_barangay == name:
-        folium.GeoJson(
-            feature,
-            name=name,
-            style_function=lambda f, name=name: {
-                "fillColor": "#D2E8BA" if name == selected_barangay else "#cccccc",
-                "color": "black",
-                "weight": 2 if name == selected_barangay else 1,
-                "fillOpacity": 0.7 if name == selected_barangay else 0.3,
-            },
-            tooltip=folium.GeoJsonTooltip(
-                fields=[
-                    "location_adm4_en",
-                    "urban_risk_index",
-                    "risk_label",
-                    "climate_exposure_score",
-                    "infra_risk",
-                    "rwi_risk",
-                    "ndvi_risk",
-                    "coast_risk",
-                    "pop_risk"
-                ],
-                aliases=[
-                    "Barangay:",
-                    "Climate Vulnerability Index:",
-                    "Risk Category:",
-                    "Climate Exposure Score:",
-                    "Amenity Risk (Relative):",
-                    "Relative Wealth Index Risk:",
-                    "NDVI Risk:",
-                    "Coast Distance Risk:",
-                    "Population Risk:"
-                ],
-                localize=True
-            )
-        ).add_to(m)
-
-# --- Zoom to selected barangay ---
+# --- Map ---
+# All barangays are drawn as ONE layer, built once per data version and
+# shared by every session; the selected barangay is sent as a feature group
+# with its own center/zoom, so st_folium updates it in place instead of
+# reloading the map. (Vector tiles don't report the clicked feature's
+# geometry here, so that mode falls back to TopoJSON.)
+overview_encoding = "geojson" if MAP_ENCODING == "geojson" else "topojson"
+overview_zoom = 13
+
+def zoom_to_bounds(bounds, width=1000, height=1000, max_zoom=18):
+    """Largest Leaflet zoom at which [[south, west], [north, east]] fits the map."""
+    (south, west), (north, east) = bounds
+    span = max((east - west) / width, (north - south) / height, 1e-9)
+    return int(min(max_zoom, math.floor(math.log2(360 / (256 * span)))))
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def render_overview_map(version, encoding):
+    m = folium.Map(location=[10.72, 122.55], zoom_start=overview_zoom)
+
+    urban_props = layer_properties("urban")
+    barangay_layer(
+        "urban",
+        tier_for_zoom(overview_zoom),
+        name="Barangays",
+        styles=style_table(urban_props, ["#cccccc"] * len(urban_props), color="black", weight=1, fillOpacity=0.3),
+        fields=[
+            "location_adm4_en",
+            "urban_risk_index",
+            "risk_label",
+            "climate_exposure_score",
+            "infra_risk",
+            "rwi_risk",
+            "ndvi_risk",
+            "coast_risk",
+            "pop_risk"
+        ],
+        aliases=[
+            "Barangay:",
+            "Climate Vulnerability Index:",
+            "Risk Category:",
+            "Climate Exposure Score:",
+            "Amenity Risk (Relative):",
+            "Relative Wealth Index Risk:",
+            "NDVI Risk:",
+            "Coast Distance Risk:",
+            "Population Risk:"
+        ],
+        encoding=encoding,
+    ).add_to(m)
+
+    # st_folium renames the map's elements the first time it renders it;
+    # doing that here keeps the component key (and so the browser's map)
+    # the same from the first rerun on
+    m.get_root().render()
+    generate_leaflet_string(m)
+    # st_folium attaches the feature group to the map it is given, so
+    # sessions take turns with the shared map
+    return m, threading.Lock()
+
+base_map, base_map_lock = render_overview_map((layer_version("urban"), geometry_version()), overview_encoding)
+
+# --- Highlight + zoom to selected barangay ---
+selection = folium.FeatureGroup(name="Selected Barangay")
+map_center = map_zoom = None
 if selected_barangay != "--Select--":
-    selected_feature = next(f for f in urban['features'] if f['properties']['location_adm4_en'] == selected_barangay)
-    bounds = get_bounds(selected_feature)
-    m.fit_bounds(bounds)
+    folium.GeoJson(
+        selected_feature,
+        style_function=lambda f: {"fillColor": "#D2E8BA", "color": "black", "weight": 2, "fillOpacity": 0.7},
+        interactive=False,
+    ).add_to(selection)
+    (south, west), (north, east) = bounds = index.bounds[props["adm4_pcode"]]
+    map_center = ((south + north) / 2, (west + east) / 2)
+    map_zoom = zoom_to_bounds(bounds)
 
 # --- Display Map ---
-st_folium(m, width=2000, height=1000)
+with base_map_lock:
+    try:
+        map_state = st_folium(
+            base_map,
+            key="overview_map",
+            height=1000,
+            use_container_width=True,
+            center=map_center,
+            zoom=map_zoom,
+            feature_group_to_add=selection,
+            returned_objects=["last_clicked"],
+        )
+    finally:
+        # Detach the selection again so the next rerun renders the map as cached
+        base_map._children.pop(selection.get_name(), None)
+
+# --- Map click -> barangay ---
+# The R-tree index (spatial_index.py) turns the clicked point into a pcode
+# without testing every polygon.
+clicked = (map_state or {}).get("last_clicked")
+if clicked and clicked != st.session_state.get("overview_last_click"):
+    st.session_state["overview_last_click"] = clicked
+    pcode = spatial_index().locate(clicked["lng"], clicked["lat"])
+    if pcode is not None:
+        clicked_name = index.by_pcode[pcode]["properties"]["location_adm4_en"]
+        if clicked_name != selected_barangay:
+            st.session_state["clicked_barangay"] = clicked_name
+            st.rerun()
 
 if selected_barangay in street_view_urls:
     components.html(f"""
@@ -472,3 +509,27 @@ if selected_barangay in street_view_urls:
         </iframe>
     </div>
     """, height=650)  # slightly taller to account for padding
+
+# --- Latest forum discussion about the selected barangay ---
+# Posts are tagged with barangays when they are written (see forum.py), so
+# this is an index read of the newest few, not a scan of the whole forum.
+if selected_barangay != "--Select--":
+    st.markdown(f"### 💬 Latest Discussion: {selected_barangay}")
+    with forum_pool().connection() as conn:
+        discussion, _ = barangay_posts(conn, props["adm4_pcode"], limit=5)
+
+    if not discussion:
+        st.info("No forum posts about this barangay yet. Mention it on the Weather Updates and Forum page!")
+
+    st.markdown("".join(f"""
+        <div style="background:#FFFFFF; padding:15px 20px; border-radius:12px; border:1px solid #D9E8C7;
+                    box-shadow:1px 1px 8px rgba(0,0,0,0.08); margin-bottom:20px;">
+            <p style="margin:0; font-weight:600; color:#2E7D32; font-size:16px;">
+                {html.escape(post.username or "")}
+                <span style="color:#6C6C6C; font-weight:400; font-size:13px;"> • {post.timestamp}</span>
+            </p>
+            <p style="margin-top:10px; color:#333;">
+                {html.escape(post.content or "")}
+            </p>
+        </div>
+    """ for post in discussion), unsafe_allow_html=True)
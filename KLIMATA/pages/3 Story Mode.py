@@ -1,11 +1,4 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import geopandas as gpd
-import folium
-from streamlit_folium import st_folium
-import json
 import streamlit.components.v1 as components
 import os # Imported os for path handling
 
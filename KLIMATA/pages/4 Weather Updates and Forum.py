@@ -1,7 +1,9 @@
 import streamlit as st
 import streamlit.components.v1 as components
-import sqlite3
 import os
+import queue
+from barangay_tags import barangay_matcher
+from forum import PAGE_SIZE, forum_pool, post_writer, recent_posts, search_posts
 
 # --- FIX 1: This must be the VERY FIRST Streamlit command ---
 st.set_page_config(layout="wide", page_title="Iloilo City Weather")
@@ -97,22 +99,9 @@ components.html("""
 # -------------------------
 # Database setup
 # -------------------------
-# Use absolute path for DB as well to avoid it resetting or getting lost
-db_path = os.path.join(current_dir, "theforum.db")
-
-conn = sqlite3.connect(db_path)
-c = conn.cursor()
-
-c.execute('''
-CREATE TABLE IF NOT EXISTS posts (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    username TEXT,
-    content TEXT,
-    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-)
-''')
-conn.commit()
-conn.close()
+# One pooled, WAL-mode connection set per process, migrated once (see
+# forum.py); the database lives in the app root as KLIMATA/theforum.db
+pool = forum_pool()
 
 # -------------------------
 # Forum UI
@@ -126,10 +115,6 @@ st.markdown("""
     </p>
 """, unsafe_allow_html=True)
 
-# Reconnect
-conn = sqlite3.connect(db_path, check_same_thread=False)
-c = conn.cursor()
-
 
 # -------------------------
 # New Post Card
@@ -160,40 +145,115 @@ st.subheader("📝 Create a new post")
 username = st.text_input("Your Name")
 content = st.text_area("Write your message", height=120)
 
+# Barangays named in the message are tagged automatically (see
+# barangay_tags.py); more can be picked here
+matcher = barangay_matcher()
+pcode_by_name = {name: pcode for pcode, name in sorted(matcher.names.items(), key=lambda item: item[1])}
+tagged = st.multiselect("Barangays this post is about (optional)", list(pcode_by_name), key="post_barangays")
+
 if st.button("Post", key="post_button"):
     if username and content:
-        c.execute("INSERT INTO posts (username, content) VALUES (?, ?)", (username, content))
-        conn.commit()
-        st.success("Your message has been posted!")
-        st.rerun() # Rerun to show the new post immediately
+        # Queued for the background writer (see forum.py); shown right away
+        try:
+            pcodes = [pcode_by_name[name] for name in tagged]
+            pcodes += [pcode for pcode in matcher.match(content) if pcode not in pcodes]
+            post_writer().submit(username, content, pcodes)
+        except queue.Full:
+            st.warning("The forum is very busy right now. Please try posting again in a moment.")
+        except RuntimeError:
+            st.error("Posts cannot be saved right now. Please try again later.")
+        else:
+            st.success("Your message has been posted!")
+            st.rerun() # Rerun to show the new post immediately
     else:
         st.warning("Please enter your name and message before posting.")
 
 st.markdown("</div>", unsafe_allow_html=True)
 
 
+# -------------------------
+# Post Cards
+# -------------------------
+post_card = """
+    <div class="forum-card">
+        <p style="margin:0; font-weight:600; color:#2E7D32; font-size:16px;">
+            {username} 
+            <span style="color:#6C6C6C; font-weight:400; font-size:13px;"> • {timestamp}</span>
+        </p>
+        <p style="margin-top:10px; color:#333;">
+            {content}
+        </p>
+    </div>
+"""
+
+
+def render_posts(posts):
+    # One markdown element per page instead of one per post
+    st.markdown("".join(post_card.format(**post._asdict()) for post in posts), unsafe_allow_html=True)
+
+
+# -------------------------
+# Search Posts
+# -------------------------
+# Full-text search through the posts_fts index (see forum.py): best matches
+# first, PAGE_SIZE more per "More results" click
+def reset_search_pages():
+    st.session_state["forum_search_pages"] = 1
+
+
+search = st.text_input(
+    "🔎 Search posts",
+    placeholder="A barangay or hazard, e.g. flood Jaro",
+    key="forum_search",
+    on_change=reset_search_pages,
+)
+
+if search.strip():
+    st.markdown("### 🔎 Search Results")
+    if "forum_search_pages" not in st.session_state:
+        reset_search_pages()
+
+    with pool.connection() as conn:
+        results, more = search_posts(conn, search, PAGE_SIZE * st.session_state["forum_search_pages"])
+
+    if not results:
+        st.info("No posts match your search.")
+    render_posts(results)
+
+    if more and st.button("More results", key="more_results"):
+        st.session_state["forum_search_pages"] += 1
+        st.rerun()
+
 # -------------------------
 # Display Posts
 # -------------------------
-st.markdown("### 📌 Recent Discussions")
-
-c.execute("SELECT username, content, timestamp FROM posts ORDER BY timestamp DESC")
-rows = c.fetchall()
-
-if not rows:
-    st.info("No posts yet. Be the first to start a discussion! 🌱")
-
-for row in rows:
-    st.markdown(f"""
-        <div class="forum-card">
-            <p style="margin:0; font-weight:600; color:#2E7D32; font-size:16px;">
-                {row[0]} 
-                <span style="color:#6C6C6C; font-weight:400; font-size:13px;"> • {row[2]}</span>
-            </p>
-            <p style="margin-top:10px; color:#333;">
-                {row[1]}
-            </p>
-        </div>
-    """, unsafe_allow_html=True)
-
-conn.close()
+else:
+    st.markdown("### 📌 Recent Discussions")
+
+    # The newest PAGE_SIZE posts, plus one more page per "Load older posts"
+    # click. Every page is a bounded index read (see forum.py), so a rerun
+    # costs the same however many posts the table holds.
+    if "forum_pages" not in st.session_state:
+        st.session_state["forum_pages"] = 1
+
+    pages = []
+    cursor = None
+    with pool.connection() as conn:
+        for _ in range(st.session_state["forum_pages"]):
+            posts, cursor = recent_posts(conn, PAGE_SIZE, before=cursor)
+            pages.append(posts)
+            if cursor is None:
+                break
+
+    # Posts still waiting in the write-behind queue go on top of the first page
+    pages[0] = post_writer().pending() + pages[0]
+
+    if not pages[0]:
+        st.info("No posts yet. Be the first to start a discussion! 🌱")
+
+    for posts in pages:
+        render_posts(posts)
+
+    if cursor is not None and st.button("Load older posts", key="load_older"):
+        st.session_state["forum_pages"] += 1
+        st.rerun()
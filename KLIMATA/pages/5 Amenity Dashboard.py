@@ -1,11 +1,4 @@
 import streamlit as st
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import geopandas as gpd
-import folium
-from streamlit_folium import st_folium
-import json
 import os
 
 # Set page config to wide layout - MUST BE FIRST
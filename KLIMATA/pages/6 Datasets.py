@@ -1,12 +1,9 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import geopandas as gpd
-import folium
-from streamlit_folium import st_folium
-import json
 import os
+from data_store import layer_version, risk_table
+from sensitivity import DEFAULT_SAMPLES, QUICK_SAMPLES, cached_sensitivity, quick_sensitivity
+from table_view import PAGE_SIZES, filter_mask, page_slice, sort_order
 
 # --- FIX 1: Page Config must be the first Streamlit command ---
 st.set_page_config(layout="wide", page_title="Climate Vulnerability Index Table")
@@ -98,80 +95,90 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# --- FIX 3: Robust Path Handling for CSV ---
-csv_filename = "RISK_TABLE.csv"
-csv_path_root = os.path.join(parent_dir, csv_filename)
-csv_path_local = os.path.join(current_dir, csv_filename)
-
+# --- CVI table from the merged barangay store (see data_store.py) ---
 df = None
 
-# Try finding the file in likely locations
-if os.path.exists(csv_path_root):
-    df = pd.read_csv(csv_path_root)
-elif os.path.exists(csv_path_local):
-    df = pd.read_csv(csv_path_local)
-else:
-    # Try loading directly (fallback for some cloud environments)
-    try:
-        df = pd.read_csv(csv_filename)
-    except FileNotFoundError:
-         st.error(f"⚠️ Could not find '{csv_filename}'. Please ensure it is uploaded to the main folder or the pages folder.")
+try:
+    df = risk_table()
+except FileNotFoundError as e:
+    st.error(f"⚠️ Could not load the barangay data: {e}")
 
 if df is not None:
-    # Style DataFrame with Pandas Styler
-    styled_df = (
-        df.style
-          .set_table_styles([
-              {'selector': 'thead',
-               'props': [
-                   ('background-color', '#D2E8BA'),
-                   ('color', 'black'),
-                   ('font-weight', 'bold'),
-                   ('border', '1px solid black')
-               ]},
-              {'selector': 'td',
-               'props': [
-                   ('border', '1px solid black'),
-                   ('padding', '8px')
-               ]},
-              {'selector': 'table',
-               'props': [
-                   ('border-collapse', 'collapse'),
-                   ('table-layout', 'fixed'),
-                   ('text-align', 'center')
-               ]}
-          ])
+    # Only the visible page is sent to the browser; filtering and sorting
+    # run on the cached table (see table_view.py)
+    f1, f2, f3, f4 = st.columns([3, 3, 2, 1])
+    search = f1.text_input("Search barangay", key="risk_search")
+    labels = f2.multiselect("Risk Label", sorted(df["Risk Label"].dropna().unique()), key="risk_labels")
+    sort_by = f3.selectbox("Sort by", list(df.columns), index=list(df.columns).index("Climate Vulnerability Index"), key="risk_sort")
+    descending = f4.toggle("Descending", value=True, key="risk_descending")
+
+    mask = filter_mask(
+        df,
+        search=search,
+        search_column="Barangay Name",
+        equals={"Risk Label": labels} if labels else None,
+    )
+    order = sort_order(df, layer_version("urban"), sort_by, ascending=not descending)
+
+    p1, p2, p3 = st.columns([1, 1, 4])
+    page_size = p1.selectbox("Rows per page", PAGE_SIZES, index=1, key="risk_page_size")
+    page = p2.number_input("Page", min_value=1, value=1, step=1, key="risk_page")
+    rows, matches, pages = page_slice(df, order, mask, page, page_size)
+
+    st.dataframe(
+        rows,
+        hide_index=True,
+        width="stretch",
+        column_config={
+            column: st.column_config.NumberColumn(format="%.3f")
+            for column in df.columns if pd.api.types.is_float_dtype(df[column])
+        },
+    )
+    first = (min(page, pages) - 1) * page_size
+    p3.markdown(
+        f"<div style='padding-top:32px'>Showing {first + 1 if matches else 0}-{first + len(rows)} "
+        f"of {matches:,} barangays (page {min(page, pages)} of {pages})</div>",
+        unsafe_allow_html=True,
     )
 
-    # Render in a container that fits the table width exactly
+# --- Rank sensitivity: Monte Carlo over weights and indicators (see sensitivity.py) ---
+# The full run is precomputed offline (python KLIMATA/sensitivity.py); without
+# it the page can only start a quick single-process run.
+if df is not None:
+    samples = DEFAULT_SAMPLES
+    sensitivity_df = cached_sensitivity(samples)
+    if sensitivity_df is None:
+        samples = QUICK_SAMPLES
+        sensitivity_df = cached_sensitivity(samples)
+
+    st.markdown("### How Stable is Each Barangay's Rank?")
     st.markdown(
-        f"""
-        <div style="
-            background-color: white;
-            padding: 15px;
-            border-radius: 10px;
-            box-shadow: 2px 2px 10px rgba(0,0,0,0.1);
-            display: inline-block;   /* container shrinks to table width */
-            max-height: 500px;
-            overflow: auto;
-        ">
-            {styled_df.to_html(render_links=True, escape=False)}
-        </div>
-
-        <style>
-            table {{
-                width: auto;           /* table width adapts to content */
-                table-layout: fixed;   /* evenly stretch columns */
-            }}
-            th, td {{
-                text-align: center;
-                word-wrap: break-word;
-            }}
-        </style>
-        """,
-        unsafe_allow_html=True
+        f"The CVI is recomputed for {samples:,} random weightings around the published "
+        "weights, each with small random errors added to the indicators. The table shows the "
+        "middle 90% of each barangay's rank (1 = most vulnerable) and how often it keeps its "
+        "published risk label."
     )
 
+    if sensitivity_df is None and st.button("Run sensitivity analysis"):
+        with st.spinner("Sampling weightings... (a few seconds)"):
+            sensitivity_df = quick_sensitivity(samples)
+
+    if sensitivity_df is not None:
+        st.dataframe(
+            sensitivity_df.drop(columns=["adm4_pcode"]),
+            hide_index=True,
+            width="stretch",
+            height=500,
+            column_config={
+                "Mean Rank": st.column_config.NumberColumn(format="%.1f"),
+                "Rank SD": st.column_config.NumberColumn(format="%.1f"),
+                "Label Stability": st.column_config.ProgressColumn(format="percent", min_value=0, max_value=1),
+                "P(Low Risk)": st.column_config.NumberColumn(format="percent"),
+                "P(Medium Risk)": st.column_config.NumberColumn(format="percent"),
+                "P(High Risk)": st.column_config.NumberColumn(format="percent"),
+            },
+        )
+
 st.markdown("### Access the Iloilo City Datasets here!")
 
 # Links to your dataset folders
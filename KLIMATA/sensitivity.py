@@ -0,0 +1,213 @@
+"""Monte Carlo sensitivity of the CVI ranking to its weights and indicators.
+
+Each sample draws a weight vector around CVI_WEIGHTS (Dirichlet) and
+perturbs every normalized indicator with Gaussian noise scaled to its spread
+across barangays, then re-scores and re-clusters all barangays exactly like
+cvi.py. Per barangay the result holds rank quantiles, the mean and spread
+of the rank, and how often each risk label came out. Ranks are integers in
+[0, n), so batches add up an n x n rank histogram (about 32k counts for the
+city's barangays) and the quantiles are read exactly from its cumulative sum.
+
+Precompute the full run for the Datasets page from the repo root:
+
+    python KLIMATA/sensitivity.py [--samples N] [--workers N]
+
+Results are cached on disk under build/ per data version and settings. The
+page itself only offers a QUICK_SAMPLES run, in one process.
+"""
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from build_data import BUILD_DIR, KEY
+from cvi import CVI_WEIGHTS, RISK_LABELS, cvi_components, score_components, weight_vector
+from data_store import layer_properties, table_version
+
+DEFAULT_SAMPLES = 100_000
+
+# Sample count of the run the Datasets page can start itself (a few seconds)
+QUICK_SAMPLES = 10_000
+
+# Dirichlet concentration: alpha = WEIGHT_CONCENTRATION * weight. Higher
+# keeps the sampled weights closer to CVI_WEIGHTS (50 -> a 0.2 weight has a
+# standard deviation of about 0.056).
+WEIGHT_CONCENTRATION = 50.0
+
+# Noise standard deviation per indicator, as a fraction of that indicator's
+# standard deviation across barangays
+INDICATOR_NOISE = 0.1
+
+BATCH_SIZE = 1000
+KMEANS_ITERATIONS = 50
+
+
+# ======================================================
+# SAMPLING
+# ======================================================
+def _kmeans_batch(scores, initial_labels, k, iterations=KMEANS_ITERATIONS):
+    """1-D k-means on every row of `scores` at once -> labels ranked by centre.
+
+    Started from `initial_labels` (the published classes), so each sample
+    lands on the clustering nearest to the published one.
+    """
+    onehot = np.eye(k)[initial_labels]
+    centres = (scores @ onehot) / np.maximum(onehot.sum(axis=0), 1)
+    for _ in range(iterations):
+        labels = np.abs(scores[:, :, None] - centres[:, None, :]).argmin(axis=2)
+        members = labels[:, :, None] == np.arange(k)
+        counts = members.sum(axis=1)
+        new = np.where(counts > 0, np.einsum("bn,bnk->bk", scores, members) / np.maximum(counts, 1), centres)
+        if np.allclose(new, centres):
+            break
+        centres = new
+    # Rank clusters by centre so 0 is always the lowest-risk class
+    rank = np.argsort(np.argsort(centres, axis=1), axis=1)
+    return np.take_along_axis(rank, labels, axis=1)
+
+
+def run_batch(components, base_labels, samples, seed):
+    """Score `samples` perturbed CVIs -> (rank counts n x n, label counts n x k)."""
+    rng = np.random.default_rng(seed)
+    n, m = components.shape
+    k = len(RISK_LABELS)
+
+    weights = rng.dirichlet(WEIGHT_CONCENTRATION * weight_vector(), size=samples)
+    spread = np.nanstd(components, axis=0) * INDICATOR_NOISE
+    perturbed = components + rng.standard_normal((samples, n, m)) * spread
+    np.clip(perturbed, 0.0, 1.0, out=perturbed)
+    scores = np.einsum("bnm,bm->bn", perturbed, weights)
+
+    # Rank 0 = most vulnerable, like the Datasets table
+    ranks = np.argsort(np.argsort(-scores, axis=1), axis=1)
+    labels = _kmeans_batch(scores, base_labels, k)
+
+    rows = np.broadcast_to(np.arange(n), ranks.shape)
+    rank_counts = np.bincount((rows * n + ranks).ravel(), minlength=n * n).reshape(n, n)
+    label_counts = np.bincount((rows * k + labels).ravel(), minlength=n * k).reshape(n, k)
+    return rank_counts, label_counts
+
+
+def _run_batch(args):
+    return run_batch(*args)
+
+
+def _quantile_from_counts(counts, q):
+    """Per-row q-quantile of a histogram over 0..n-1."""
+    cumulative = np.cumsum(counts, axis=1)
+    target = q * cumulative[:, -1:]
+    return (cumulative < target).sum(axis=1)
+
+
+def run_sensitivity(samples=DEFAULT_SAMPLES, workers=None, seed=0):
+    """Rank and label distribution of every barangay over `samples` draws."""
+    pcodes, components = cvi_components()
+    published = score_components(pcodes, components)
+    base_labels = published["risk_level"].to_numpy()
+    n, k = len(pcodes), len(RISK_LABELS)
+    unlabelled = (base_labels < 0) | (base_labels >= k)
+    if unlabelled.any():
+        raise ValueError(f"Barangays without a published risk label: {', '.join(pcodes[unlabelled])}")
+
+    sizes = [BATCH_SIZE] * (samples // BATCH_SIZE) + ([samples % BATCH_SIZE] if samples % BATCH_SIZE else [])
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(components, base_labels, size, s) for size, s in zip(sizes, seeds)]
+
+    rank_counts = np.zeros((n, n), dtype=np.int64)
+    label_counts = np.zeros((n, k), dtype=np.int64)
+    workers = workers or os.cpu_count() or 1
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            results = list(pool.map(_run_batch, tasks, chunksize=max(1, len(tasks) // (4 * workers))))
+    else:
+        results = map(_run_batch, tasks)
+    for ranks, labels in results:
+        rank_counts += ranks
+        label_counts += labels
+
+    positions = np.arange(n)
+    mean = (rank_counts @ positions) / samples
+    sd = np.sqrt(np.maximum((rank_counts @ positions ** 2) / samples - mean ** 2, 0))
+    shares = label_counts / samples
+
+    names = layer_properties("urban").set_index(KEY)["location_adm4_en"].reindex(pcodes)
+    result = pd.DataFrame({
+        KEY: pcodes,
+        "Barangay Name": names.to_numpy(),
+        "Rank": published["urban_risk_index"].rank(ascending=False, method="first").astype(int).to_numpy(),
+        "Median Rank": _quantile_from_counts(rank_counts, 0.5) + 1,
+        "Rank 5%": _quantile_from_counts(rank_counts, 0.05) + 1,
+        "Rank 95%": _quantile_from_counts(rank_counts, 0.95) + 1,
+        "Mean Rank": mean + 1,
+        "Rank SD": sd,
+        "Risk Label": published["risk_label"].to_numpy(),
+        "Label Stability": shares[positions, base_labels],
+    })
+    for i, label in enumerate(RISK_LABELS):
+        result[f"P({label})"] = shares[:, i]
+    return result.sort_values("Rank", ignore_index=True)
+
+
+# ======================================================
+# DISK CACHE
+# ======================================================
+def result_path(samples=DEFAULT_SAMPLES, seed=0):
+    """Cache file for one data version and sampling setup."""
+    settings = {
+        "version": table_version(),
+        "samples": samples,
+        "seed": seed,
+        "weights": CVI_WEIGHTS,
+        "concentration": WEIGHT_CONCENTRATION,
+        "noise": INDICATOR_NOISE,
+        # Results saved before quantiles came from the pooled rank histogram
+        "quantiles": "exact",
+    }
+    digest = hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:12]
+    return os.path.join(BUILD_DIR, f"sensitivity-{digest}.parquet")
+
+
+def cached_sensitivity(samples=DEFAULT_SAMPLES, seed=0):
+    """The saved result for these settings, or None if not run yet."""
+    path = result_path(samples, seed)
+    return pd.read_parquet(path) if os.path.exists(path) else None
+
+
+def sensitivity(samples=DEFAULT_SAMPLES, workers=None, seed=0):
+    """Saved result, running (and saving) the analysis first if needed."""
+    result = cached_sensitivity(samples, seed)
+    if result is None:
+        result = run_sensitivity(samples, workers, seed)
+        try:
+            os.makedirs(BUILD_DIR, exist_ok=True)
+            result.to_parquet(result_path(samples, seed), index=False)
+        except OSError:
+            pass
+    return result
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def _quick_sensitivity(version, samples, seed):
+    return sensitivity(samples, workers=1, seed=seed)
+
+
+def quick_sensitivity(samples=QUICK_SAMPLES, seed=0):
+    """sensitivity() in one process, memoized per data version for the app."""
+    return _quick_sensitivity(table_version(), samples, seed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES)
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    result = sensitivity(args.samples, args.workers, args.seed)
+    print(result.head(20).to_string(index=False))
+    print(f"Saved to {result_path(args.samples, args.seed)}")
@@ -0,0 +1,82 @@
+import numpy as np
+import shapely
+import streamlit as st
+from rtree import index as rtree_index
+
+from build_data import BBOX_COLUMNS, KEY
+from data_store import geometry_version, load_table
+
+# ======================================================
+# BARANGAY SPATIAL INDEX
+# ======================================================
+# An R-tree over the precomputed barangay bounding boxes narrows every
+# lookup to a handful of candidates, which are then tested exactly against
+# the (prepared) polygons. Coordinates are lon/lat (EPSG:4326).
+
+
+class BarangaySpatialIndex:
+    def __init__(self, pcodes, geometries, boxes):
+        self.pcodes = np.asarray(pcodes, dtype=object)
+        self.geometries = np.asarray(geometries)
+        shapely.prepare(self.geometries)
+        self.tree = rtree_index.Index(
+            (i, tuple(box), None)
+            for i, box in enumerate(np.asarray(boxes, dtype=float))
+            if not np.isnan(box).any()
+        )
+
+    def locate_many(self, lons, lats):
+        """adm4_pcode of the barangay containing each point (None if outside).
+
+        Candidates for all points come from one bulk R-tree query; the
+        exact point-in-polygon tests run vectorized. A point on a shared
+        border goes to the first barangay in table order.
+        """
+        lons = np.asarray(lons, dtype=float)
+        lats = np.asarray(lats, dtype=float)
+        result = np.full(len(lons), None, dtype=object)
+        valid = np.flatnonzero(np.isfinite(lons) & np.isfinite(lats))
+        if not len(valid):
+            return result
+
+        points = np.column_stack([lons[valid], lats[valid]])
+        candidates, counts = self.tree.intersection_v(points, points)
+        candidates = candidates.astype(np.int64)
+        owners = np.repeat(valid, counts.astype(np.int64))
+        # The tree returns each point's candidates in no particular order;
+        # sort them by table row so the first hit below is deterministic
+        order = np.lexsort((candidates, owners))
+        owners, candidates = owners[order], candidates[order]
+        hits = shapely.intersects_xy(self.geometries[candidates], lons[owners], lats[owners])
+
+        # First hit per point (owners are sorted in point order)
+        owners, candidates = owners[hits], candidates[hits]
+        first = np.r_[True, owners[1:] != owners[:-1]] if len(owners) else []
+        result[owners[first]] = self.pcodes[candidates[first]]
+        return result
+
+    def locate(self, lon, lat):
+        """adm4_pcode of the barangay containing one point, or None."""
+        return self.locate_many([lon], [lat])[0]
+
+    def query_bbox(self, minx, miny, maxx, maxy, exact=True):
+        """adm4_pcodes of the barangays overlapping a lon/lat box.
+
+        With exact=False only the bounding boxes are compared.
+        """
+        candidates = np.fromiter(self.tree.intersection((minx, miny, maxx, maxy)), dtype=np.int64)
+        if exact and len(candidates):
+            box = shapely.box(minx, miny, maxx, maxy)
+            candidates = candidates[shapely.intersects(self.geometries[candidates], box)]
+        return self.pcodes[np.sort(candidates)].tolist()
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _spatial_index(geometry):
+    table = load_table()
+    return BarangaySpatialIndex(table[KEY], table.geometry.values, table[BBOX_COLUMNS].to_numpy())
+
+
+def spatial_index():
+    """The barangay spatial index, built once per process and geometry version."""
+    return _spatial_index(geometry_version())
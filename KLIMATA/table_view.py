@@ -0,0 +1,58 @@
+"""Paged, sorted and filtered view of a large table.
+
+The table itself stays cached; a rerun only computes the filter mask
+(vectorized), reuses a cached sort order for the chosen column and hands the
+visible page to the browser, so the cost of a page does not grow with the
+table.
+"""
+import math
+
+import numpy as np
+import streamlit as st
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+
+@st.cache_resource(show_spinner=False, max_entries=32)
+def _sort_order(_table, key, column, ascending):
+    # `key` identifies `_table` (e.g. its data version); the table itself is
+    # not hashed. Missing values sort last in both directions.
+    values = _table[column]
+    missing = values.isna().to_numpy()
+    present = np.flatnonzero(~missing)
+    order = present[np.argsort(values.to_numpy()[present], kind="stable")]
+    if not ascending:
+        order = order[::-1]
+    return np.concatenate([order, np.flatnonzero(missing)])
+
+
+def sort_order(table, key, column, ascending=True):
+    """Row positions of `table` sorted by `column`, cached per (key, column)."""
+    return _sort_order(table, key, column, ascending)
+
+
+def filter_mask(table, search=None, search_column=None, equals=None, ranges=None):
+    """Boolean row mask for the filters that are set.
+
+    search  - case-insensitive substring of `search_column`
+    equals  - {column: allowed values}
+    ranges  - {column: (low, high)}, inclusive
+    """
+    mask = np.ones(len(table), dtype=bool)
+    if search:
+        mask &= table[search_column].str.contains(search, case=False, regex=False, na=False).to_numpy()
+    for column, allowed in (equals or {}).items():
+        mask &= table[column].isin(allowed).to_numpy()
+    for column, (low, high) in (ranges or {}).items():
+        values = table[column].to_numpy(dtype=float)
+        mask &= (values >= low) & (values <= high)
+    return mask
+
+
+def page_slice(table, order, mask, page, page_size):
+    """(rows of `page` (1-based), number of matching rows, number of pages)."""
+    rows = order[mask[order]]
+    pages = max(1, math.ceil(len(rows) / page_size))
+    page = min(max(page, 1), pages)
+    start = (page - 1) * page_size
+    return table.iloc[rows[start:start + page_size]], len(rows), pages
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The app's modules live next to KLIMATA.py, not in an installed package
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
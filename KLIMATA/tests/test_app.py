@@ -0,0 +1,57 @@
+import importlib
+import json
+import os
+
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from conftest import APP_DIR
+
+
+def map_page(at):
+    return at.get("iframe")[0].proto.srcdoc
+
+
+@pytest.fixture
+def mvt_encoding(monkeypatch):
+    import map_layers
+
+    monkeypatch.setenv("KLIMATA_MAP_ENCODING", "mvt")
+    importlib.reload(map_layers)
+    st.cache_resource.clear()
+    yield
+    monkeypatch.delenv("KLIMATA_MAP_ENCODING")
+    importlib.reload(map_layers)
+    st.cache_resource.clear()
+
+
+def test_what_if_falls_back_from_vector_tiles(mvt_encoding):
+    at = AppTest.from_file(os.path.join(APP_DIR, "KLIMATA.py"), default_timeout=120).run()
+    assert not at.exception
+    assert "vectorGrid.protobuf" in map_page(at)
+
+    # Vector tiles have no eachLayer(), so the restyled map must be TopoJSON
+    at.slider(key="cvi_weight_pop_risk").set_value(0.5).run()
+    assert not at.exception
+    page = map_page(at)
+    assert "vectorGrid.protobuf" not in page
+    assert "topojson.feature" in page
+    assert "eachLayer" in page
+
+
+def test_overview_selection_keeps_the_map():
+    at = AppTest.from_file(os.path.join(APP_DIR, "pages", "2 Barangay Overview.py"), default_timeout=120).run()
+    assert not at.exception
+
+    def map_component():
+        return next(e.proto for e in at.main if e.type == "component_instance")
+
+    # The cached base map renders the same every time, so st_folium keeps
+    # its key and only the selected barangay changes in the browser
+    first = map_component()
+    at.sidebar.selectbox[0].set_value("Bito-on").run()
+    assert not at.exception
+    selected = map_component()
+    assert selected.id == first.id
+    assert json.loads(selected.json_args)["feature_group"] != json.loads(first.json_args)["feature_group"]
@@ -0,0 +1,47 @@
+from barangay_tags import BarangayMatcher
+
+NAMES = {
+    "bito_on": "Bito-on",
+    "tabuc_suba": "Tabuc Suba (Jaro)",
+    "luna_jaro": "Luna (Jaro)",
+    "luna_la_paz": "Luna (La Paz)",
+    "rizal_1": "Rizal Palapala I",
+    "rizal_2": "Rizal Palapala II",
+    "rizal_la_paz": "Rizal (La Paz)",
+    "inday": "Inday",
+    "nonoy": "Nonoy",
+    "airport": "Airport (Tabucan Airport)",
+}
+
+
+def test_separators_between_words():
+    matcher = BarangayMatcher(NAMES)
+    assert matcher.match("Bito-on flooded") == ["bito_on"]
+    assert matcher.match("bito on flooded") == ["bito_on"]
+    assert matcher.match("Luna, Jaro and Luna (La Paz)") == ["luna_jaro", "luna_la_paz"]
+
+
+def test_words_run_together():
+    matcher = BarangayMatcher(NAMES)
+    assert matcher.match("bitoon flooded") == ["bito_on"]
+    assert matcher.match("Road closed in Tabucsuba") == ["tabuc_suba"]
+
+
+def test_longest_name_wins():
+    matcher = BarangayMatcher(NAMES)
+    assert matcher.match("Rizal Palapala II") == ["rizal_2"]
+    assert matcher.match("Luna") == []
+
+
+def test_common_words_are_not_barangays():
+    matcher = BarangayMatcher(NAMES)
+    assert matcher.match("Salamat Inday, ingat kamo Nonoy. Airport road flooded.") == []
+    assert matcher.match("Walking along rizal street") == []
+
+
+def test_common_word_names_after_barangay_prefix():
+    matcher = BarangayMatcher(NAMES)
+    assert matcher.match("Brgy. Inday and Barangay Nonoy flooded") == ["inday", "nonoy"]
+    assert matcher.match("bgy rizal") == ["rizal_la_paz"]
+    assert matcher.match("Brgy. Rizal Palapala I") == ["rizal_1"]
+    assert matcher.match("Airport (Tabucan Airport)") == ["airport"]
@@ -0,0 +1,78 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+import forum
+from forum import ConnectionPool, PostWriter, migrate, recent_posts
+
+
+class FlakyPool(ConnectionPool):
+    """A pool whose connections fail while `down` is set."""
+
+    down = False
+
+    @contextmanager
+    def connection(self):
+        if self.down:
+            raise sqlite3.OperationalError("database is locked")
+        with super().connection() as conn:
+            yield conn
+
+
+def make_pool(tmp_path):
+    pool = FlakyPool(str(tmp_path / "forum.db"))
+    with pool.connection() as conn:
+        migrate(conn)
+    return pool
+
+
+def stored_posts(pool):
+    with pool.connection() as conn:
+        return [post.content for post in recent_posts(conn, 100)[0]]
+
+
+def test_failed_batch_is_spooled_and_committed_later(tmp_path, monkeypatch):
+    monkeypatch.setattr(forum, "RETRY_DELAY", 0)
+    pool = make_pool(tmp_path)
+    spool = tmp_path / "forum.db.unsaved.jsonl"
+
+    pool.down = True
+    writer = PostWriter(pool, spool_path=str(spool))
+    writer.submit("ana", "Baha sa Jaro", ["PH0630200"])
+    assert writer.flush(timeout=10)
+    assert spool.exists()
+    assert writer.error is None
+    assert [post.content for post in writer.pending()] == ["Baha sa Jaro"]
+
+    # A new writer (e.g. after a restart) picks the spool up and commits it
+    writer._closed = True
+    pool.down = False
+    restarted = PostWriter(pool, spool_path=str(spool))
+    restarted.close(timeout=10)
+    assert stored_posts(pool) == ["Baha sa Jaro"]
+    assert not spool.exists()
+    assert restarted.pending() == []
+
+
+def test_committed_posts_leave_the_pending_view_at_once(tmp_path, monkeypatch):
+    committed = threading.Event()
+    real_add_posts = forum.add_posts
+
+    def add_posts(conn, rows):
+        ids = real_add_posts(conn, rows)
+        committed.set()
+        # Give a page rerun the chance to look right after the commit
+        time.sleep(0.2)
+        return ids
+
+    monkeypatch.setattr(forum, "add_posts", add_posts)
+    pool = make_pool(tmp_path)
+    writer = PostWriter(pool, spool_path=str(tmp_path / "forum.db.unsaved.jsonl"))
+    writer.submit("ana", "Baha sa Jaro")
+    assert committed.wait(10)
+
+    # The page reads the database first, then the pending posts
+    seen = stored_posts(pool) + [post.content for post in writer.pending()]
+    assert seen == ["Baha sa Jaro"]
+    writer.close(timeout=10)
@@ -0,0 +1,81 @@
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import numpy as np
+import pandas as pd
+
+from build_data import DATA_DIR, KEY, LAYER_FILES, SEP
+from data_store import load_table
+from ingest import derived_updates, diff_cells
+
+PCODE = "ph063022001"
+
+
+def test_diff_cells_ignores_equal_and_missing_values():
+    current = pd.DataFrame({"climate__pr": [1.0, 2.0], "urban__risk_label": ["Low", "High"]}, index=["a", "b"])
+    updates = pd.DataFrame(
+        {"climate__pr": [1.0 + 1e-12, np.nan], "urban__risk_label": ["Low", "Medium"]}, index=["a", "b"]
+    )
+
+    changes = diff_cells(current, updates)
+    assert changes[[KEY, "column", "old", "new"]].values.tolist() == [["b", "urban__risk_label", "High", "Medium"]]
+    assert diff_cells(current, current).empty
+
+
+def test_derived_updates_reproduce_the_shipped_cvi():
+    table = load_table().set_index(KEY)
+    assert diff_cells(table, derived_updates(table)).empty
+
+
+def copy_app(tmp_path):
+    """The app's modules, layer files and built table in a scratch directory."""
+    app = tmp_path / "KLIMATA"
+    (app / "build").mkdir(parents=True)
+    layers = [os.path.join(DATA_DIR, fn) for fn in LAYER_FILES.values()]
+    for path in glob.glob(os.path.join(DATA_DIR, "*.py")) + layers:
+        shutil.copy(path, app)
+    for path in glob.glob(os.path.join(DATA_DIR, "build", "*.parquet")):
+        shutil.copy(path, app / "build")
+    return app
+
+
+def run_ingest(app, updates, layer):
+    updates.to_csv(app / "updates.csv", index=False)
+    result = subprocess.run(
+        [sys.executable, "ingest.py", "updates.csv", "--layer", layer],
+        cwd=app, capture_output=True, text=True, check=True,
+    )
+    manifests = glob.glob(str(app / "build" / "manifest-*.json"))
+    with open(manifests[0]) as f:
+        return result.stdout, json.load(f)
+
+
+def test_ingest_bumps_only_the_touched_layers(tmp_path):
+    app = copy_app(tmp_path)
+    current = load_table().set_index(KEY).loc[PCODE]
+
+    # heat_index feeds nothing else: only the climate layer changes
+    heat = pd.DataFrame({KEY: [PCODE], "heat_index": [current[f"climate{SEP}heat_index"] + 1]})
+    output, first = run_ingest(app, heat, "climate")
+    assert "1 changed cells, 0 derived cells in layers climate" in output
+    source = first["geometry"]
+    assert first["table"] != source
+    assert first["layers"] == {name: first["table"] if name == "climate" else source for name in LAYER_FILES}
+
+    # The same update again is not a change
+    output, second = run_ingest(app, heat, "climate")
+    assert "No changes." in output
+    assert second == first
+
+    # ndvi is a CVI input: the urban layer's scores are recomputed too
+    ndvi = pd.DataFrame({KEY: [PCODE], "ndvi": [current[f"climate{SEP}ndvi"] + 0.2]})
+    output, third = run_ingest(app, ndvi, "climate")
+    assert "in layers climate, urban" in output
+    assert third["table"] not in (first["table"], source)
+    assert third["layers"] == {
+        "urban": third["table"], "pop": source, "infra": source, "climate": third["table"],
+    }
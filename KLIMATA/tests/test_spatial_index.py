@@ -0,0 +1,11 @@
+import shapely
+
+from spatial_index import BarangaySpatialIndex
+
+
+def test_shared_border_goes_to_first_barangay():
+    # The points at x=2 and x=1 lie on borders shared by two barangays
+    geometries = [shapely.box(2, 0, 3, 1), shapely.box(1, 0, 2, 1), shapely.box(0, 0, 1, 1)]
+    index = BarangaySpatialIndex(["c", "b", "a"], geometries, shapely.bounds(geometries))
+
+    assert index.locate_many([2.0, 1.0, 0.5, 5.0], [0.5, 0.5, 0.5, 0.5]).tolist() == ["c", "b", "a", None]
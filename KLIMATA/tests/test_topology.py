@@ -0,0 +1,103 @@
+import numpy as np
+import shapely
+from shapely.geometry import shape
+
+from data_store import load_layer
+from topology import DEFAULT_PRECISION, to_topology
+
+# Snapping to the grid moves a vertex by at most half a step diagonally
+# (~0.7e-5 deg); dropping vertices that collapse onto a neighbour moves the
+# outline by less than another step
+TOLERANCE = 2 * DEFAULT_PRECISION
+
+
+def decode(topology, object_name):
+    """Decode a TopoJSON object back into GeoJSON geometries, like topojson-client."""
+    scale = np.asarray(topology["transform"]["scale"])
+    translate = np.asarray(topology["transform"]["translate"])
+    arcs = [np.cumsum(np.asarray(arc, dtype=float), axis=0) * scale + translate for arc in topology["arcs"]]
+
+    def ring(arc_ids):
+        points = []
+        for i in arc_ids:
+            arc = arcs[i] if i >= 0 else arcs[~i][::-1]
+            # Consecutive arcs share their end point
+            points.extend(arc.tolist() if not points else arc[1:].tolist())
+        return points
+
+    geometries = []
+    for geometry in topology["objects"][object_name]["geometries"]:
+        if geometry["type"] == "Polygon":
+            coordinates = [ring(r) for r in geometry["arcs"]]
+        elif geometry["type"] == "MultiPolygon":
+            coordinates = [[ring(r) for r in polygon] for polygon in geometry["arcs"]]
+        else:
+            geometries.append(None)
+            continue
+        geometries.append({"type": geometry["type"], "coordinates": coordinates})
+    return geometries
+
+
+def assert_round_trip(collection, topology, name):
+    geometries = topology["objects"][name]["geometries"]
+    assert len(geometries) == len(collection["features"])
+    for feature, geometry, decoded in zip(collection["features"], geometries, decode(topology, name)):
+        assert geometry["properties"] == feature["properties"]
+        source = shape(feature["geometry"])
+        # Not necessarily valid: snapping can make a border touch itself
+        result = shape(decoded)
+        assert source.hausdorff_distance(result) <= TOLERANCE
+        assert abs(result.area - source.area) <= TOLERANCE * source.length
+        # Same rings in the same winding order
+        assert ring_orientations(result) == ring_orientations(source)
+
+
+def ring_orientations(geometry):
+    rings = []
+    for polygon in shapely.get_parts(geometry):
+        rings.append(polygon.exterior)
+        rings.extend(polygon.interiors)
+    return shapely.is_ccw(rings).tolist()
+
+
+def arc_set(arc_ids):
+    # ~i is arc i walked backwards
+    return {i if i >= 0 else ~i for i in arc_ids}
+
+
+def feature(pcode, coordinates, kind="Polygon"):
+    return {"type": "Feature", "properties": {"pcode": pcode}, "geometry": {"type": kind, "coordinates": coordinates}}
+
+
+def test_round_trip_shares_borders():
+    # Two squares sharing an edge, a square with a hole and an island that
+    # fills the hole, and a two-part MultiPolygon
+    collection = {"type": "FeatureCollection", "features": [
+        feature("a", [[[122.5, 10.7], [122.51, 10.7], [122.51, 10.71], [122.5, 10.71], [122.5, 10.7]]]),
+        feature("b", [[[122.51, 10.7], [122.52, 10.7], [122.52, 10.71], [122.51, 10.71], [122.51, 10.7]]]),
+        feature("c", [
+            [[122.53, 10.7], [122.56, 10.7], [122.56, 10.73], [122.53, 10.73], [122.53, 10.7]],
+            [[122.54, 10.71], [122.54, 10.72], [122.55, 10.72], [122.55, 10.71], [122.54, 10.71]],
+        ]),
+        feature("d", [[[122.54, 10.71], [122.55, 10.71], [122.55, 10.72], [122.54, 10.72], [122.54, 10.71]]]),
+        feature("e", [
+            [[[122.6, 10.7], [122.601234, 10.7], [122.601234, 10.701234], [122.6, 10.7]]],
+            [[[122.61, 10.7], [122.612, 10.7], [122.612, 10.702], [122.61, 10.7]]],
+        ], kind="MultiPolygon"),
+    ]}
+    topology = to_topology(collection, "barangays")
+
+    assert_round_trip(collection, topology, "barangays")
+    # The shared edge of a/b and the hole/island outline are stored once:
+    # a, b and c's outside, the shared edge, the hole and e's two parts
+    assert len(topology["arcs"]) == 7
+    a, b, c, d, _ = (geometry["arcs"] for geometry in topology["objects"]["barangays"]["geometries"])
+    assert len(arc_set(a[0]) & arc_set(b[0])) == 1
+    assert arc_set(c[1]) == arc_set(d[0])
+
+
+def test_round_trip_of_the_city_layer():
+    collection = load_layer("urban")
+    topology = to_topology(collection, "urban")
+
+    assert_round_trip(collection, topology, "urban")
@@ -0,0 +1,213 @@
+"""Local Mapbox Vector Tile (MVT) endpoint for the barangay layers.
+
+In vector-tile mode (KLIMATA_MAP_ENCODING=mvt, see map_layers.py) the map
+no longer embeds whole layers in the page. Each rendered layer is
+"published" under a key that fixes its tooltip fields and per-barangay
+styles, and Leaflet.VectorGrid fetches
+
+    <KLIMATA_TILE_URL>/<key>/<z>/<x>/<y>.pbf
+
+for the tiles in view only. Tiles are cut from the zoom-appropriate geometry
+tier and cached on disk under build/tiles/<key>/.
+
+The server starts in a background thread of the Streamlit process; it can
+also be run on its own (serving keys published earlier):
+
+    python KLIMATA/tile_server.py
+
+Either way it listens on KLIMATA_TILE_HOST (default 127.0.0.1 only). If the
+port is already taken by a standalone server, the app uses that one.
+"""
+import errno
+import hashlib
+import json
+import math
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import mapbox_vector_tile
+import shapely
+import streamlit as st
+
+from build_data import BUILD_DIR, KEY, tier_column
+from data_store import geometry_version, layer_version, load_layer, load_table, tier_for_zoom
+
+TILE_HOST = os.environ.get("KLIMATA_TILE_HOST", "127.0.0.1")
+TILE_PORT = int(os.environ.get("KLIMATA_TILE_PORT", "8765"))
+TILE_URL = os.environ.get("KLIMATA_TILE_URL", f"http://localhost:{TILE_PORT}")
+TILE_DIR = os.path.join(BUILD_DIR, "tiles")
+
+TILE_EXTENT = 4096
+# Geometry is clipped slightly outside each tile so borders don't show seams
+TILE_BUFFER = 64 / TILE_EXTENT
+
+# Half the Web Mercator world width in metres
+ORIGIN_SHIFT = 20037508.342789244
+
+
+# ======================================================
+# PUBLISHED LAYERS
+# ======================================================
+def publish(layer, fields, styles):
+    """Register a layer for tiling and return its key.
+
+    `styles` maps adm4_pcode -> Leaflet path style. The key is a hash of
+    everything that ends up in a tile, so identical layers from different
+    sessions share one on-disk tile cache.
+    """
+    meta = {
+        "layer": layer,
+        "fields": list(fields),
+        "styles": styles,
+        "version": layer_version(layer),
+    }
+    key = hashlib.sha1(json.dumps(meta, sort_keys=True).encode()).hexdigest()[:12]
+
+    meta_path = os.path.join(TILE_DIR, key, "meta.json")
+    if not os.path.exists(meta_path):
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        _write_atomic(meta_path, json.dumps(meta).encode())
+    return key
+
+
+def tile_url(key):
+    return f"{TILE_URL}/{key}/{{z}}/{{x}}/{{y}}.pbf"
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+# ======================================================
+# TILE RENDERING
+# ======================================================
+def tile_bounds(z, x, y):
+    """Web Mercator bounds (minx, miny, maxx, maxy) of an XYZ tile."""
+    size = 2 * ORIGIN_SHIFT / 2 ** z
+    minx = -ORIGIN_SHIFT + x * size
+    maxy = ORIGIN_SHIFT - y * size
+    return (minx, maxy - size, minx + size, maxy)
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def _mercator_geometries(tier, geometry):
+    """One tier's polygons in EPSG:3857 with a spatial index."""
+    table = load_table()
+    geoms = table[tier_column(tier)].to_crs(3857)
+    return table[KEY].tolist(), geoms.values, shapely.STRtree(geoms.values)
+
+
+def _clean(value):
+    # MVT values must be str/int/float/bool; missing values are dropped
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value if isinstance(value, (str, int, float, bool)) else str(value)
+
+
+def render_tile(meta, z, x, y):
+    """Encode one tile of a published layer as MVT bytes."""
+    minx, miny, maxx, maxy = tile_bounds(z, x, y)
+    pad = (maxx - minx) * TILE_BUFFER
+    pcodes, geoms, tree = _mercator_geometries(tier_for_zoom(z), geometry_version())
+
+    props = {f["properties"][KEY]: f["properties"] for f in load_layer(meta["layer"])["features"]}
+    features = []
+    for i in tree.query(shapely.box(minx - pad, miny - pad, maxx + pad, maxy + pad)):
+        pcode = pcodes[i]
+        if pcode not in props:
+            continue
+        geometry = shapely.clip_by_rect(geoms[i], minx - pad, miny - pad, maxx + pad, maxy + pad)
+        if geometry.is_empty:
+            continue
+        properties = {field: _clean(props[pcode].get(field)) for field in meta["fields"]}
+        properties.update(meta["styles"].get(pcode, {}))
+        properties[KEY] = pcode
+        features.append({
+            "geometry": geometry,
+            "properties": {k: v for k, v in properties.items() if v is not None},
+        })
+
+    return mapbox_vector_tile.encode(
+        [{"name": meta["layer"], "features": features}],
+        default_options={"quantize_bounds": (minx, miny, maxx, maxy), "extents": TILE_EXTENT},
+    )
+
+
+def get_tile(key, z, x, y):
+    """Tile bytes from the disk cache, rendering them on first request."""
+    key_dir = os.path.join(TILE_DIR, key)
+    path = os.path.join(key_dir, str(z), str(x), f"{y}.pbf")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    with open(os.path.join(key_dir, "meta.json"), "r") as f:
+        meta = json.load(f)
+    data = render_tile(meta, z, x, y)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_atomic(path, data)
+    except OSError:
+        pass
+    return data
+
+
+# ======================================================
+# HTTP ENDPOINT
+# ======================================================
+class TileHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        try:
+            key, z, x, y = self.path.split("?")[0].strip("/").split("/")
+            if not key.isalnum() or not y.endswith(".pbf"):
+                raise ValueError(self.path)
+            data = get_tile(key, int(z), int(x), int(y[:-len(".pbf")]))
+        except (ValueError, FileNotFoundError):
+            self.send_error(404)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-protobuf")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Access-Control-Allow-Origin", "*")
+        self.send_header("Cache-Control", "public, max-age=86400")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# The server outlives Streamlit's caches (clearing them must not start a
+# second one on the same port), so it is a module-level singleton
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_tile_server():
+    """Start the tile endpoint once per process (background thread).
+
+    Returns the server, or None when another process (e.g. a standalone
+    tile_server.py) already serves TILE_PORT; tiles are then fetched from it.
+    """
+    global _server
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((TILE_HOST, TILE_PORT), TileHandler)
+            except OSError as e:
+                if e.errno != errno.EADDRINUSE:
+                    raise
+                return None
+            threading.Thread(target=_server.serve_forever, daemon=True, name="klimata-tiles").start()
+        return _server
+
+
+if __name__ == "__main__":
+    server = ThreadingHTTPServer((TILE_HOST, TILE_PORT), TileHandler)
+    print(f"Serving barangay vector tiles on {TILE_URL}")
+    server.serve_forever()
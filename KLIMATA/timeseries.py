@@ -0,0 +1,391 @@
+"""Columnar time-series store for the climate indicators.
+
+iloilo_cli3.0.geojson only holds one snapshot per barangay. The store keeps
+every daily snapshot of CLIMATE_INDICATORS for all barangays as one
+memory-mapped float32 array per indicator, shaped (days, barangays), on a
+dense daily axis (days without data are NaN):
+
+    timeseries/
+        meta.json        {"start": "YYYY-MM-DD", "pcodes": [...], "indicators": [...]}
+        heat_index.f4    row i = start + i days, column j = pcodes[j]
+        ...
+
+Appending a day writes one row per indicator; reading a window is a slice of
+the mapped file, so nothing is parsed or loaded beyond the rows asked for.
+Rolling aggregates and anomaly scores are computed for all barangays at once
+from prefix sums over the time axis.
+
+Run from the repo root:
+
+    python KLIMATA/timeseries.py seed --date 2025-06-01
+    python KLIMATA/timeseries.py append snapshot.csv --date 2025-06-02 [--ingest]
+    python KLIMATA/timeseries.py show [--days 30]
+
+`seed` stores the shipped climate layer as the first day. `append` takes a
+table keyed by adm4_pcode with indicator columns; with --ingest the snapshot
+also becomes the current climate layer (see ingest.py), so the map and the
+KPIs show it.
+"""
+import argparse
+import json
+import os
+import warnings
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from build_data import DATA_DIR, KEY
+from data_store import file_version, layer_properties
+
+TIMESERIES_DIR = os.path.join(DATA_DIR, "timeseries")
+
+CLIMATE_INDICATORS = ["heat_index", "pr", "no2", "co", "so2", "o3", "pm10", "pm25", "ndvi"]
+
+DTYPE = np.float32
+
+ONE_DAY = np.timedelta64(1, "D")
+
+# How old a barangay's last value may be and still count as current
+CURRENT_MAX_AGE = 30
+
+
+def meta_path(root=TIMESERIES_DIR):
+    return os.path.join(root, "meta.json")
+
+
+def indicator_path(indicator, root=TIMESERIES_DIR):
+    return os.path.join(root, f"{indicator}.f4")
+
+
+# ======================================================
+# WRITING
+# ======================================================
+def create_store(pcodes, start, indicators=CLIMATE_INDICATORS, root=TIMESERIES_DIR):
+    """Start an empty store for `pcodes` whose first day is `start`."""
+    if os.path.exists(meta_path(root)):
+        raise FileExistsError(f"A time-series store already exists in {root}")
+    os.makedirs(root, exist_ok=True)
+    for indicator in indicators:
+        open(indicator_path(indicator, root), "wb").close()
+    meta = {"start": str(np.datetime64(start, "D")), "pcodes": list(pcodes), "indicators": list(indicators)}
+    with open(meta_path(root), "w") as f:
+        json.dump(meta, f)
+    return meta
+
+
+def read_meta(root=TIMESERIES_DIR):
+    with open(meta_path(root), "r") as f:
+        return json.load(f)
+
+
+def append_snapshot(snapshot, date, root=TIMESERIES_DIR):
+    """Store one day of indicator values (a table keyed by adm4_pcode).
+
+    Days after the last stored day extend the files (skipped days become
+    NaN rows); a day already in the store is overwritten where `snapshot`
+    has a value. Every indicator file grows together, so indicators missing
+    from `snapshot` get a NaN row. Unknown pcodes and columns that are not
+    indicators of the store are ignored.
+    """
+    meta = read_meta(root)
+    day = int((np.datetime64(date, "D") - np.datetime64(meta["start"], "D")) / ONE_DAY)
+    if day < 0:
+        raise ValueError(f"{date} is before the start of the store ({meta['start']})")
+
+    n = len(meta["pcodes"])
+    snapshot = snapshot.set_index(KEY).reindex(meta["pcodes"])
+    for indicator in meta["indicators"]:
+        if indicator in snapshot:
+            values = snapshot[indicator].to_numpy(dtype=DTYPE)
+        else:
+            values = np.full(n, np.nan, dtype=DTYPE)
+        path = indicator_path(indicator, root)
+        days = os.path.getsize(path) // (n * np.dtype(DTYPE).itemsize)
+        if day >= days:
+            # Pad skipped days with NaN and write the new row in one append
+            rows = np.full((day - days + 1, n), np.nan, dtype=DTYPE)
+            rows[-1] = values
+            with open(path, "ab") as f:
+                rows.tofile(f)
+        else:
+            stored = np.memmap(path, dtype=DTYPE, mode="r+", shape=(days, n))
+            keep = np.isnan(values)
+            stored[day] = np.where(keep, stored[day], values)
+            stored.flush()
+            del stored
+
+
+# ======================================================
+# READING
+# ======================================================
+class ClimateSeries:
+    """Read-only view of the store: one (days, barangays) memmap per indicator."""
+
+    def __init__(self, root=TIMESERIES_DIR):
+        meta = read_meta(root)
+        self.pcodes = np.asarray(meta["pcodes"])
+        self.indicators = meta["indicators"]
+        self.start = np.datetime64(meta["start"], "D")
+
+        n = len(self.pcodes)
+        self.arrays = {}
+        for indicator in self.indicators:
+            path = indicator_path(indicator, root)
+            days = os.path.getsize(path) // (n * np.dtype(DTYPE).itemsize)
+            # np.memmap can't map an empty file
+            self.arrays[indicator] = (
+                np.memmap(path, dtype=DTYPE, mode="r", shape=(days, n)) if days else np.empty((0, n), dtype=DTYPE)
+            )
+        # Indicators are appended together, so the shortest file is the
+        # last complete day
+        self.days = min(len(a) for a in self.arrays.values()) if self.arrays else 0
+
+    @property
+    def end(self):
+        """Last stored day (None while the store is empty)."""
+        return self.start + (self.days - 1) * ONE_DAY if self.days else None
+
+    def dates(self, first=0, stop=None):
+        stop = self.days if stop is None else stop
+        return self.start + np.arange(first, stop) * ONE_DAY
+
+    def _row(self, date):
+        # Row index one past `date` (the end of a window ending on `date`)
+        if date is None:
+            return self.days
+        return int(np.clip((np.datetime64(date, "D") - self.start) / ONE_DAY + 1, 0, self.days))
+
+    def values(self, indicator, first=0, stop=None):
+        """(stop - first, barangays) float64 array; no copy beyond the rows read."""
+        stop = self.days if stop is None else stop
+        return np.asarray(self.arrays[indicator][first:stop], dtype=float)
+
+    def last_n_days(self, indicator, days, end=None):
+        """Values of the `days` days up to `end` (default: the last day).
+
+        Returns a DataFrame indexed by date with one column per pcode.
+        """
+        stop = self._row(end)
+        first = max(stop - days, 0)
+        return pd.DataFrame(self.values(indicator, first, stop), index=self.dates(first, stop), columns=self.pcodes)
+
+    def rolling(self, indicator, window, stat="mean", min_periods=1, end=None):
+        """Trailing `window`-day aggregate for every day and barangay.
+
+        stat is "mean", "sum", "count", "std", "min" or "max"; NaN days are
+        skipped and a window with fewer than `min_periods` values is NaN.
+        Returns a DataFrame like last_n_days covering all days up to `end`.
+        """
+        stop = self._row(end)
+        x = self.values(indicator, 0, stop)
+        if stat in ("min", "max"):
+            padded = np.vstack([np.full((window - 1, x.shape[1]), np.nan), x])
+            windows = np.lib.stride_tricks.sliding_window_view(padded, window, axis=0)
+            with warnings.catch_warnings():
+                # All-NaN windows are expected; they stay NaN
+                warnings.simplefilter("ignore", RuntimeWarning)
+                out = (np.nanmin if stat == "min" else np.nanmax)(windows, axis=-1)
+            count = _window_sums(np.isfinite(x).astype(float), window)
+        else:
+            total, count, squares = _window_moments(x, window)
+            with np.errstate(all="ignore"):
+                if stat == "sum":
+                    out = total
+                elif stat == "count":
+                    out = count
+                elif stat == "mean":
+                    out = total / count
+                elif stat == "std":
+                    out = np.sqrt(np.maximum(squares / count - (total / count) ** 2, 0) * count / (count - 1))
+                else:
+                    raise ValueError(f"Unknown rolling stat: {stat}")
+        if stat != "count":
+            out = np.where(count >= min_periods, out, np.nan)
+        return pd.DataFrame(out, index=self.dates(0, stop), columns=self.pcodes)
+
+    def anomaly(self, indicator, baseline=30, min_periods=7, end=None):
+        """z-score of each day against the `baseline` days before it.
+
+        Per barangay, (x_t - mean) / std of the trailing baseline window
+        (excluding day t). NaN where the baseline has fewer than
+        `min_periods` values or no spread.
+        """
+        stop = self._row(end)
+        x = self.values(indicator, 0, stop)
+        total, count, squares = _window_moments(x, baseline, lag=1)
+        with np.errstate(all="ignore"):
+            mean = total / count
+            std = np.sqrt(np.maximum(squares / count - mean ** 2, 0) * count / (count - 1))
+            z = (x - mean) / std
+        z[(count < min_periods) | ~(std > 0)] = np.nan
+        return pd.DataFrame(z, index=self.dates(0, stop), columns=self.pcodes)
+
+    def latest_anomaly(self, indicator, baseline=30, min_periods=7, end=None):
+        """anomaly() of the last day only (a Series by pcode).
+
+        Reads just that day and its baseline window instead of the whole
+        history.
+        """
+        stop = self._row(end)
+        x = self.values(indicator, max(stop - baseline - 1, 0), stop)
+        if not len(x):
+            return pd.Series(np.nan, index=self.pcodes, name=indicator)
+        finite = np.isfinite(x[:-1])
+        values = np.where(finite, x[:-1], 0.0)
+        total, count, squares = values.sum(axis=0), finite.sum(axis=0), (values * values).sum(axis=0)
+        with np.errstate(all="ignore"):
+            mean = total / count
+            std = np.sqrt(np.maximum(squares / count - mean ** 2, 0) * count / (count - 1))
+            z = (x[-1] - mean) / std
+        z[(count < min_periods) | ~(std > 0)] = np.nan
+        return pd.Series(z, index=self.pcodes, name=indicator)
+
+    def current(self, indicators=None, max_age=None, end=None):
+        """Latest value of each indicator per barangay, as a layer-like table.
+
+        A barangay with no value on the last day takes its most recent
+        earlier one, at most `max_age` days old (default: any age). The
+        returned DataFrame has KEY, one column per indicator and "date" (the
+        store's last day up to `end`).
+        """
+        stop = self._row(end)
+        indicators = indicators or self.indicators
+        first = 0 if max_age is None else max(stop - max_age - 1, 0)
+        frame = pd.DataFrame({KEY: self.pcodes})
+        for indicator in indicators:
+            x = self.values(indicator, first, stop)
+            observed = np.isfinite(x)
+            # Row of the last observation per column (-1 if none)
+            last = np.where(observed.any(axis=0), len(x) - 1 - observed[::-1].argmax(axis=0), -1)
+            latest = np.full(x.shape[1], np.nan)
+            found = last >= 0
+            latest[found] = x[last[found], np.flatnonzero(found)]
+            frame[indicator] = latest
+        frame["date"] = self.start + (stop - 1) * ONE_DAY if stop else pd.NaT
+        return frame
+
+    def city_mean(self, indicator, days, end=None):
+        """City-wide daily mean of the last `days` days (a Series by date)."""
+        window = self.last_n_days(indicator, days, end)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            return pd.Series(np.nanmean(window.to_numpy(), axis=1), index=window.index, name=indicator)
+
+
+def _window_moments(x, window, lag=0):
+    """Sum, count and sum of squares over the trailing window of every row.
+
+    The window of row t covers rows t-lag-window+1 .. t-lag; NaN is skipped.
+    """
+    finite = np.isfinite(x)
+    values = np.where(finite, x, 0.0)
+    return (
+        _window_sums(values, window, lag),
+        _window_sums(finite.astype(float), window, lag),
+        _window_sums(values * values, window, lag),
+    )
+
+
+def _window_sums(x, window, lag=0):
+    # Prefix sums along time: sum(rows a..b) = S[b+1] - S[a]
+    prefix = np.vstack([np.zeros((1, x.shape[1])), np.cumsum(x, axis=0)])
+    rows = np.arange(len(x))
+    stop = np.clip(rows + 1 - lag, 0, len(x))
+    first = np.clip(rows + 1 - lag - window, 0, len(x))
+    return prefix[stop] - prefix[first]
+
+
+# ======================================================
+# CACHED ACCESSOR
+# ======================================================
+def store_version(root=TIMESERIES_DIR):
+    """(mtime, size) of meta.json and every indicator file; None without a store."""
+    if not os.path.exists(meta_path(root)):
+        return None
+    meta = read_meta(root)
+    return (file_version(meta_path(root)),) + tuple(
+        file_version(indicator_path(indicator, root)) for indicator in meta["indicators"]
+    )
+
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def _climate_series(version, root):
+    return ClimateSeries(root)
+
+
+def climate_series(root=TIMESERIES_DIR):
+    """The store mapped once per version, or None if there is none yet.
+
+    Appending a day changes the files' sizes, so the next call maps the new
+    rows.
+    """
+    version = store_version(root)
+    if version is None:
+        return None
+    series = _climate_series(version, root)
+    return series if series.days else None
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def _current_conditions(version, root, indicators, max_age):
+    return _climate_series(version, root).current(list(indicators), max_age)
+
+
+def current_conditions(indicators=None, max_age=CURRENT_MAX_AGE, root=TIMESERIES_DIR):
+    """ClimateSeries.current() computed once per store version (shared,
+    read-only), or None while the store is empty.
+
+    Only the last `max_age` days of `indicators` (default: all) are read.
+    """
+    series = climate_series(root)
+    if series is None:
+        return None
+    indicators = tuple(indicators or series.indicators)
+    return _current_conditions(store_version(root), root, indicators, max_age)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed = commands.add_parser("seed", help="start the store with the shipped climate layer")
+    seed.add_argument("--date", required=True, help="date of the shipped snapshot (YYYY-MM-DD)")
+
+    append = commands.add_parser("append", help="store one day of indicator values")
+    append.add_argument("snapshot", help="CSV or Parquet table keyed by adm4_pcode")
+    append.add_argument("--date", required=True, help="YYYY-MM-DD")
+    append.add_argument("--ingest", action="store_true", help="also make it the current climate layer")
+
+    show = commands.add_parser("show", help="print current conditions and anomalies")
+    show.add_argument("--days", type=int, default=30, help="anomaly baseline in days")
+    args = parser.parse_args()
+
+    if args.command == "seed":
+        climate = layer_properties("climate")
+        create_store(climate[KEY], args.date)
+        append_snapshot(climate, args.date)
+        print(f"Started {TIMESERIES_DIR} with {len(climate)} barangays on {args.date}")
+
+    elif args.command == "append":
+        if args.snapshot.endswith(".parquet"):
+            snapshot = pd.read_parquet(args.snapshot)
+        else:
+            snapshot = pd.read_csv(args.snapshot)
+        append_snapshot(snapshot, args.date)
+        print(f"Stored {args.date}")
+        if args.ingest:
+            from ingest import ingest
+
+            indicators = [c for c in CLIMATE_INDICATORS if c in snapshot]
+            report = ingest(snapshot[[KEY] + indicators], layer="climate")
+            print(f"{len(report.changes)} changed cells -> table version {report.version}")
+
+    else:
+        series = ClimateSeries()
+        current = series.current()
+        print(f"{series.days} days, {series.start} .. {series.end}")
+        for indicator in series.indicators:
+            z = series.latest_anomaly(indicator, baseline=args.days)
+            print(f"{indicator:<12} mean {current[indicator].mean():>10.3f}   "
+                  f"anomalous barangays (|z| > 2): {int((z.abs() > 2).sum())}")
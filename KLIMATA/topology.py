@@ -0,0 +1,139 @@
+import numpy as np
+
+# ======================================================
+# TOPOJSON ENCODING
+# ======================================================
+# Neighbouring barangays share borders, and a GeoJSON FeatureCollection
+# stores every shared border twice at full float precision. A TopoJSON
+# topology stores each border ("arc") once, as delta-encoded integers on a
+# quantization grid; folium.TopoJson decodes it in the browser with
+# topojson-client.
+
+# Grid step in degrees (1e-5 deg ~ 1.1 m at Iloilo's latitude)
+DEFAULT_PRECISION = 1e-5
+
+
+def _rings(geometry):
+    """Yield (polygon index, ring) pairs for a Polygon/MultiPolygon dict."""
+    if geometry["type"] == "Polygon":
+        polygons = [geometry["coordinates"]]
+    elif geometry["type"] == "MultiPolygon":
+        polygons = geometry["coordinates"]
+    else:
+        raise ValueError(f"Unsupported geometry type: {geometry['type']}")
+    for i, polygon in enumerate(polygons):
+        for ring in polygon:
+            yield i, ring
+
+
+def _quantize(ring, translate, precision):
+    """Snap a closed ring to the grid; returns open list of (x, y) ints."""
+    q = np.rint((np.asarray(ring, dtype=float)[:, :2] - translate) / precision).astype(np.int64)
+    # Drop the closing point and any points that collapsed onto their neighbour
+    keep = np.ones(len(q), dtype=bool)
+    keep[1:] = np.any(q[1:] != q[:-1], axis=1)
+    q = q[keep]
+    if len(q) > 1 and tuple(q[0]) == tuple(q[-1]):
+        q = q[:-1]
+    return [tuple(p) for p in q.tolist()]
+
+
+def _find_junctions(rings):
+    """Points where rings stop running alongside the same neighbours."""
+    neighbours = {}
+    junctions = set()
+    for ring in rings:
+        n = len(ring)
+        for i, point in enumerate(ring):
+            pair = (ring[i - 1], ring[(i + 1) % n])
+            seen = neighbours.setdefault(point, pair)
+            if seen != pair and seen != pair[::-1]:
+                junctions.add(point)
+    return junctions
+
+
+def _cut(ring, junctions):
+    """Split an open ring into arcs that start and end on junctions."""
+    starts = [i for i, point in enumerate(ring) if point in junctions]
+    if not starts:
+        # Free-standing ring: one closed arc, started at a canonical point
+        # so that a hole and the island filling it produce the same arc.
+        k = ring.index(min(ring))
+        ring = ring[k:] + ring[:k]
+        return [ring + [ring[0]]]
+
+    k = starts[0]
+    ring = ring[k:] + ring[:k]
+    starts = [i - k for i in starts] + [len(ring)]
+    ring = ring + [ring[0]]
+    return [ring[a:b + 1] for a, b in zip(starts[:-1], starts[1:])]
+
+
+def to_topology(collection, object_name, properties=None, precision=DEFAULT_PRECISION):
+    """Encode a Polygon/MultiPolygon FeatureCollection as a TopoJSON dict.
+
+    Properties are kept per geometry, limited to the `properties` keys when
+    given; the result can be passed straight to
+    folium.TopoJson(topology, f"objects.{object_name}").
+    """
+    features = collection["features"]
+    all_points = np.concatenate([
+        np.asarray(ring, dtype=float)[:, :2]
+        for feature in features for _, ring in _rings(feature["geometry"])
+    ])
+    translate = all_points.min(axis=0)
+
+    quantized = [
+        [(i, _quantize(ring, translate, precision)) for i, ring in _rings(feature["geometry"])]
+        for feature in features
+    ]
+    quantized = [[(i, ring) for i, ring in rings if len(ring) >= 3] for rings in quantized]
+    junctions = _find_junctions(ring for rings in quantized for _, ring in rings)
+
+    arcs = []
+    arc_index = {}
+
+    def arc_id(arc):
+        key = tuple(arc)
+        if key in arc_index:
+            return arc_index[key]
+        reverse = key[::-1]
+        if reverse in arc_index:
+            return ~arc_index[reverse]
+        arc_index[key] = len(arcs)
+        arcs.append(arc)
+        return arc_index[key]
+
+    geometries = []
+    for feature, rings in zip(features, quantized):
+        polygons = {}
+        for i, ring in rings:
+            polygons.setdefault(i, []).append([arc_id(arc) for arc in _cut(ring, junctions)])
+        polygons = list(polygons.values())
+        if not polygons:
+            # Everything collapsed on the grid: keep a null geometry so the
+            # geometry list stays aligned with the features
+            geometries.append({"type": None, "properties": feature["properties"]})
+            continue
+        geometries.append({
+            "type": "Polygon" if len(polygons) == 1 else "MultiPolygon",
+            "arcs": polygons[0] if len(polygons) == 1 else polygons,
+            "properties": (
+                feature["properties"] if properties is None
+                else {key: feature["properties"].get(key) for key in properties}
+            ),
+        })
+
+    # Delta-encode each arc: first point absolute, then offsets
+    encoded = []
+    for arc in arcs:
+        points = np.asarray(arc, dtype=np.int64)
+        points[1:] = np.diff(points, axis=0)
+        encoded.append(points.tolist())
+
+    return {
+        "type": "Topology",
+        "transform": {"scale": [precision, precision], "translate": translate.tolist()},
+        "objects": {object_name: {"type": "GeometryCollection", "geometries": geometries}},
+        "arcs": encoded,
+    }